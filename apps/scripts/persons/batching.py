@@ -0,0 +1,106 @@
+"""
+Batch sizing module
+Chooses how many rows go into each insert transaction
+"""
+import logging
+from typing import Dict, List, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FixedBatchSizer:
+    """Always uses the same batch size; records what each batch cost"""
+
+    def __init__(self, batch_size: int = 100):
+        self.batch_size = batch_size
+        # (rows, seconds, failed rows) per batch
+        self.history: List[Tuple[int, float, int]] = []
+
+    def next_size(self) -> int:
+        return self.batch_size
+
+    def record(self, rows: int, seconds: float, failed: int = 0):
+        """Report how long a batch of `rows` took to insert and commit"""
+        self.history.append((rows, seconds, failed))
+
+    def summary(self) -> Dict[str, Any]:
+        """Batch sizes used and the throughput they achieved"""
+        if not self.history:
+            return {'batches': 0}
+        sizes = [rows for rows, _, _ in self.history]
+        total_rows = sum(sizes)
+        total_seconds = sum(seconds for _, seconds, _ in self.history)
+        return {
+            'batches': len(self.history),
+            'min_size': min(sizes),
+            'max_size': max(sizes),
+            'final_size': self.next_size(),
+            'mean_batch_seconds': total_seconds / len(self.history),
+            'rows_per_second': total_rows / total_seconds if total_seconds > 0 else 0.0,
+            'failed_rows': sum(failed for _, _, failed in self.history)
+        }
+
+
+class AdaptiveBatchSizer(FixedBatchSizer):
+    """Steers the batch size toward a target insert+commit latency.
+
+    The per-row cost is tracked as a moving average, and the next size is the
+    number of rows that cost predicts will fit in `target_seconds`. Growth is
+    limited to doubling per batch so one fast batch cannot overshoot. Batches with
+    failed rows halve the size, because a failing batch is retried row by row and
+    smaller batches limit that rework.
+    """
+
+    def __init__(self, initial_size: int = 100, target_seconds: float = 0.5,
+                 min_size: int = 10, max_size: int = 5000, smoothing: float = 0.3):
+        super().__init__(initial_size)
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+        self.smoothing = smoothing
+        self._seconds_per_row = None
+
+    def record(self, rows: int, seconds: float, failed: int = 0):
+        super().record(rows, seconds, failed)
+        if rows <= 0:
+            return
+
+        if failed:
+            new_size = self.batch_size // 2
+        else:
+            observed = seconds / rows
+            if self._seconds_per_row is None:
+                self._seconds_per_row = observed
+            else:
+                self._seconds_per_row += self.smoothing * (observed - self._seconds_per_row)
+            ideal = self.target_seconds / self._seconds_per_row if self._seconds_per_row > 0 else self.max_size
+            new_size = int(min(ideal, self.batch_size * 2))
+
+        new_size = max(self.min_size, min(self.max_size, new_size))
+        if new_size != self.batch_size:
+            logger.debug(f"Batch size {self.batch_size} -> {new_size} "
+                         f"(last batch {rows} rows in {seconds:.3f}s, {failed} failed)")
+        self.batch_size = new_size
+
+    def summary(self) -> Dict[str, Any]:
+        summary = super().summary()
+        summary['target_seconds'] = self.target_seconds
+        return summary
+
+
+def format_batching_report(summary: Dict[str, Any]) -> str:
+    """Human readable batch size and throughput report"""
+    if not summary.get('batches'):
+        return "Batching: no batches inserted"
+    lines = [
+        "=== BATCHING ===",
+        f"Batches: {summary['batches']} (sizes {summary['min_size']}-{summary['max_size']}, "
+        f"final {summary['final_size']})",
+        f"Mean batch latency: {summary['mean_batch_seconds']:.3f}s",
+        f"Throughput: {summary['rows_per_second']:.0f} rows/s",
+    ]
+    if 'target_seconds' in summary:
+        lines.append(f"Target batch latency: {summary['target_seconds']:.3f}s")
+    if summary['failed_rows']:
+        lines.append(f"Rows failing inside batches: {summary['failed_rows']}")
+    return "\n".join(lines)
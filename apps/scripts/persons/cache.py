@@ -0,0 +1,190 @@
+"""
+Processing cache module
+Stores cleaned records and rejects so repeated runs skip re-parsing the CSV
+"""
+import gzip
+import hashlib
+import importlib.util
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Tuple
+
+from config import ImportConfig
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of cache entries changes
+CACHE_FORMAT_VERSION = 2
+
+ENTRY_SUFFIX = '.jsonl.gz'
+
+# Modules outside the config and processor class hierarchies whose code decides
+# what a row becomes: schema validation and the csv engine
+FINGERPRINTED_MODULES = ('schema', 'streaming')
+
+
+def _encode_value(value: Any) -> Any:
+    """JSON default hook: datetimes are the only non-JSON values in cleaned records"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+class ProcessingCache:
+    """On-disk cache of `DataProcessor.iter_processed_rows` output.
+
+    Entries are keyed by the CSV content hash, the import configuration, the source
+    of the config and processor modules, and any processing options, so changing
+    any of them simply misses the cache. Each entry is a gzipped JSON-lines file: a
+    header with the key and preview, then one line per processed row. JSON is only
+    data, so a tampered entry can change what is imported (like editing the CSV
+    would) but cannot run code; the directory is still created private to the user.
+    """
+
+    def __init__(self, cache_dir: str = '.import_cache'):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def file_hash(csv_path: str) -> str:
+        """SHA-256 of the file contents, read in chunks"""
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def config_fingerprint(config: ImportConfig, processor: Any) -> str:
+        """Hash of the mappings, cleaners and code that shape processed output"""
+        digest = hashlib.sha256()
+        digest.update(str(CACHE_FORMAT_VERSION).encode())
+        for attribute in ('COLUMN_MAPPINGS', 'DEFAULT_VALUES', 'REQUIRED_FIELDS', 'NOTES_FIELDS'):
+            digest.update(repr(getattr(config, attribute, None)).encode())
+        for field, cleaner in sorted(config.FIELD_CLEANERS.items()):
+            digest.update(f"{field}:{getattr(cleaner, '__qualname__', repr(cleaner))}".encode())
+        # Code version: any edit to the config or processor classes invalidates the cache
+        for cls in (type(config), type(processor)):
+            for klass in cls.__mro__:
+                if klass is object:
+                    continue
+                module = sys.modules.get(klass.__module__)
+                try:
+                    digest.update(inspect.getsource(module).encode())
+                except (OSError, TypeError):
+                    digest.update(klass.__qualname__.encode())
+        for name in FINGERPRINTED_MODULES:
+            spec = importlib.util.find_spec(name)
+            with open(spec.origin, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def key(self, csv_path: str, config: ImportConfig, processor: Any, **options: Any) -> str:
+        """Cache key for processing `csv_path` with the given config and options"""
+        digest = hashlib.sha256()
+        digest.update(self.file_hash(csv_path).encode())
+        digest.update(self.config_fingerprint(config, processor).encode())
+        digest.update(repr(sorted(options.items())).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, csv_path: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{self._entry_prefix(csv_path)}{key[:32]}{ENTRY_SUFFIX}")
+
+    @staticmethod
+    def _entry_prefix(csv_path: str) -> str:
+        """Readable file name plus a hash of the absolute path, so same-named files don't collide"""
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        readable = "".join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        path_hash = hashlib.sha256(os.path.abspath(csv_path).encode()).hexdigest()[:16]
+        return f"{readable}-{path_hash}-"
+
+    def load(self, csv_path: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry header for `key`, or None on a miss or unreadable entry.
+
+        Rows are not read here; `iter_rows` streams them from the entry file.
+        """
+        path = self._entry_path(csv_path, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.loads(f.readline())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != key:
+            return None
+        entry['path'] = path
+        logger.info(f"Loaded processed data from cache: {path}")
+        return entry
+
+    def recording(self, csv_path: str, key: str, preview: str,
+                  rows: Iterable[Tuple[Any, Optional[Dict[str, Any]], List[str]]]) -> Iterator[Tuple[Any, Optional[Dict[str, Any]], List[str]]]:
+        """Pass processed rows through while writing them to the cache.
+
+        The entry is written to a temporary file and only moved into place once
+        every row has gone through, so a stopped or failed run never leaves a
+        partial entry. Rows are written as they pass, keeping memory flat.
+        """
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        path = self._entry_path(csv_path, key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-', suffix=ENTRY_SUFFIX)
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8', compresslevel=6) as f:
+                header = {'version': CACHE_FORMAT_VERSION, 'key': key, 'source': os.path.abspath(csv_path),
+                          'preview': preview}
+                f.write(json.dumps(header) + '\n')
+                for row in rows:
+                    f.write(json.dumps(row, default=_encode_value) + '\n')
+                    yield row
+            os.replace(tmp_path, path)
+            completed = True
+            logger.info(f"Saved processed data to cache: {path}")
+            self._prune(csv_path, path)
+        finally:
+            if not completed:
+                self._remove(tmp_path)
+
+    def save(self, csv_path: str, key: str, preview: str,
+             rows: Iterable[Tuple[Any, Optional[Dict[str, Any]], List[str]]]):
+        """Store processed rows, replacing older entries for the same source file"""
+        for _ in self.recording(csv_path, key, preview, rows):
+            pass
+
+    def _prune(self, csv_path: str, keep_path: str):
+        """Remove older entries of the same source file"""
+        prefix = self._entry_prefix(csv_path)
+        for existing in os.listdir(self.cache_dir):
+            existing_path = os.path.join(self.cache_dir, existing)
+            if existing.startswith(prefix) and existing.endswith(ENTRY_SUFFIX) and existing_path != keep_path:
+                # Another worker may be pruning the same entries
+                self._remove(existing_path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def iter_rows(entry: Dict[str, Any], processor: Any):
+        """Replay cached rows in `iter_processed_rows` form with fresh ids and timestamps"""
+        with gzip.open(entry['path'], 'rt', encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                row_number, cleaned_data, errors = json.loads(line, object_hook=_decode_object)
+                if cleaned_data is not None:
+                    cleaned_data = processor.stamp_record(cleaned_data)
+                yield row_number, cleaned_data, errors
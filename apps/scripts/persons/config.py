@@ -3,9 +3,25 @@ Configuration module for CSV import
 Contains all mappings and transformations that can be easily modified
 """
 from typing import Dict, List, Optional, Any, Callable
+import math
 import re
 from datetime import datetime
 
+def is_missing(value: Any) -> bool:
+    """True for None and the NaN pandas uses for empty cells, without importing pandas"""
+    if value is None:
+        return True
+    if type(value).__name__ in ('NAType', 'NaTType'):
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+# A capitalized word or an initial; a '.' only belongs to a name after a single
+# letter, so "Sita Devi Thapa. Lives in Pokhara" stops at "Thapa"
+_NAME_WORD = r"[A-Z](?:\.|[\w'-]*)"
+# An email address, a phone number or a run of capitalized words (a name)
+_RELATIONSHIP_REF = (r"(?P<ref>[\w.+-]+@[\w-]+(?:\.[\w-]+)+|\+?\d[\d\s-]{5,}\d|"
+                     + _NAME_WORD + r"(?:[ \t]+" + _NAME_WORD + r")+)")
+
 class ImportConfig:
     # Database connection settings
     DB_CONFIG = {
@@ -58,17 +74,20 @@ class ImportConfig:
     
     # Default values for required fields
     DEFAULT_VALUES = {
-        'center': 'Nepal',
         'type': 'sangha_member',
         'createdBy': 'csv_import_script',
         'lastUpdatedBy': 'csv_import_script'
     }
     
+    # Center assigned to imported persons, looked up by center.name and stored in person.center_id;
+    # empty leaves center_id NULL, since no migration creates a center
+    DEFAULT_CENTER = ''
+    
     # Data cleaning functions
     @staticmethod
     def clean_phone_number(phone: str) -> Optional[str]:
         """Clean and format phone numbers"""
-        if not phone or pd.isna(phone):
+        if not phone or is_missing(phone):
             return None
         # Remove all non-digit characters except +
         cleaned = re.sub(r'[^\d+]', '', str(phone))
@@ -77,7 +96,7 @@ class ImportConfig:
     @staticmethod
     def clean_email(email: str) -> Optional[str]:
         """Validate and clean email addresses"""
-        if not email or pd.isna(email):
+        if not email or is_missing(email):
             return None
         email = str(email).strip().lower()
         # Basic email validation
@@ -88,7 +107,7 @@ class ImportConfig:
     def clean_year(year: str) -> Optional[int]:
         """Clean and validate year values"""
         nepal_max_year = 2084  # Example max year in Nepali calendar
-        if not year or pd.isna(year):
+        if not year or is_missing(year):
             return None
         try:
             year_int = int(float(str(year)))
@@ -99,7 +118,7 @@ class ImportConfig:
     @staticmethod
     def clean_boolean(value: str) -> Optional[bool]:
         """Convert Yes/No, Y/N to boolean"""
-        if not value or pd.isna(value):
+        if not value or is_missing(value):
             return None
         value_str = str(value).strip().lower()
         if value_str in ['yes', 'y', 'true', '1']:
@@ -111,7 +130,7 @@ class ImportConfig:
     @staticmethod
     def map_membership_type(membership_type: str) -> Optional[str]:
         """Map membership type to enum values"""
-        if not membership_type or pd.isna(membership_type):
+        if not membership_type or is_missing(membership_type):
             return None
         
         mapping = {
@@ -128,7 +147,7 @@ class ImportConfig:
     @staticmethod
     def map_calendar_type(calendar_type: str) -> Optional[str]:
         """Map calendar type to enum values"""
-        if not calendar_type or pd.isna(calendar_type):
+        if not calendar_type or is_missing(calendar_type):
             return None
         
         cleaned = str(calendar_type).strip().upper()
@@ -137,13 +156,15 @@ class ImportConfig:
     @staticmethod
     def map_title(title: str) -> Optional[str]:
         """Map dharma instructor title to enum values"""
-        if not title or pd.isna(title):
+        if not title or is_missing(title):
             return None
         
         mapping = {
             'dharma dhar': 'dharma_dhar',
             'sahayak dharmacharya': 'sahayak_dharmacharya',
-            'sahayak samathacharya': 'sahayak_samathacharya'
+            'sahayak samathacharya': 'sahayak_samathacharya',
+            'khenpo': 'khenpo',
+            'dharmacharya': 'dharmacharya'
         }
         
         cleaned = str(title).strip().lower()
@@ -160,7 +181,7 @@ class ImportConfig:
         ]
         
         for indicator in refuge_indicators:
-            if indicator and pd.notna(indicator) and str(indicator).strip():
+            if indicator and not is_missing(indicator) and str(indicator).strip():
                 return True
         
         return False
@@ -178,7 +199,38 @@ class ImportConfig:
     }
     
     # Required fields that must not be null
-    REQUIRED_FIELDS = ['firstName', 'lastName', 'address', 'center', 'type', 'createdBy', 'lastUpdatedBy']
+    REQUIRED_FIELDS = ['firstName', 'lastName', 'address', 'type', 'createdBy', 'lastUpdatedBy']
+    
+    # Relationship references resolved against existing persons after import.
+    # A reference is a full name, email address or phone number of the related person,
+    # and the relationship type says what that person is to the row's person.
+    # CSV column -> relationship type; cells may list several references separated by ';' or ','
+    RELATIONSHIP_COLUMNS: Dict[str, str] = {
+        # 'Spouse': 'spouse',
+    }
+    
+    # Free-text references: (CSV column, regex with a `ref` group, relationship type)
+    RELATIONSHIP_PATTERNS = [
+        ('Remarks', r"(?i:\b(?:spouse|wife|husband)(?:\s+of)?)\s*[:\-]?\s*" + _RELATIONSHIP_REF, 'spouse'),
+        ('Remarks', r"(?i:\b(?:son|daughter|child)\s+of)\s*[:\-]?\s*" + _RELATIONSHIP_REF, 'parent'),
+        ('Remarks', r"(?i:\b(?:father|mother|parent)\s+of)\s*[:\-]?\s*" + _RELATIONSHIP_REF, 'child'),
+        ('Remarks', r"(?i:\b(?:brother|sister|sibling)(?:\s+of)?)\s*[:\-]?\s*" + _RELATIONSHIP_REF, 'sibling'),
+    ]
+    
+    # Same pairs as the server's RELATIONSHIP_RECIPROCALS; both directions are stored
+    RELATIONSHIP_RECIPROCALS = {
+        'parent': 'child',
+        'child': 'parent',
+        'spouse': 'spouse',
+        'sibling': 'sibling',
+        'grandparent': 'grandchild',
+        'grandchild': 'grandparent',
+        'guardian': 'ward',
+        'ward': 'guardian',
+        'partner': 'partner',
+        'relative': 'relative',
+        'other': 'other'
+    }
     
     # Fields that should be included in notes if not mapped
     NOTES_FIELDS = [
@@ -190,5 +242,85 @@ class ImportConfig:
         'MahaKrama Level'
     ]
 
-# Import pandas here to avoid circular imports
-import pandas as pd
\ No newline at end of file
+class RegistrationConfig(ImportConfig):
+    """Mappings for registration form exports (the headers the server's registration import reads)"""
+    TABLE = 'registration'
+    
+    # Form header -> registration column; several headers may feed the same column,
+    # the first non-empty one wins
+    COLUMN_MAPPINGS = {
+        'Timestamp': 'src_timestamp',
+        'First Name and Middle Name': 'first_name',  # Split into first_name and middle_name
+        'Last Name / Surname': 'last_name',
+        'Last Name / Surname ': 'last_name',  # Note the space
+        'Cell Phone Number': 'phone',
+        'Viber Number': 'viber_number',
+        'Viber': 'viber_number',
+        'Viber Phone Number': 'viber_number',
+        'Email Address': 'email',
+        'Email Address (optional)': 'email',
+        'Your Address': 'address',
+        'Country of Residence': 'country',
+        'Gender': 'gender'
+    }
+    
+    # Long question headers change between form versions, so they are matched when the
+    # header contains every phrase (case-insensitive), as the server import does
+    COLUMN_KEYWORDS = {
+        'previously_attended_camp': ['previously attended', 'summer', 'winter', 'nature of mind'],
+        'krama_instructor_text': ['krama instructor'],
+        'empowerment_text': ['received any of these empowerments'],
+        'session_text': ['which session']
+    }
+    
+    # Columns written by COPY; status and imported_at keep their database defaults
+    COPY_COLUMNS = [
+        'id', 'src_timestamp', 'first_name', 'middle_name', 'last_name', 'phone', 'viber_number', 'email',
+        'address', 'country', 'gender', 'previously_attended_camp', 'krama_instructor_text',
+        'empowerment_text', 'session_text', 'imported_by', 'import_batch_id', 'raw_data',
+        'createdAt', 'updatedAt'
+    ]
+    
+    DEFAULT_VALUES = {
+        'imported_by': 'csv_import_script'
+    }
+    
+    @staticmethod
+    def parse_timestamp(value: str) -> Optional[datetime]:
+        """Parse form timestamps (Google Forms writes M/D/YYYY H:MM:SS)"""
+        if not value or is_missing(value):
+            return None
+        value = str(value).strip()
+        for fmt in ('%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%Y/%m/%d %H:%M:%S', '%d/%m/%Y %H:%M:%S'):
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def clean_lowercase(value: str) -> Optional[str]:
+        """Trim and lowercase without further validation, like the server import"""
+        if not value or is_missing(value):
+            return None
+        value = str(value).strip().lower()
+        return value if value else None
+    
+    FIELD_CLEANERS: Dict[str, Callable[[Any], Any]] = {
+        'src_timestamp': parse_timestamp.__func__,
+        'phone': ImportConfig.clean_phone_number,
+        'viber_number': ImportConfig.clean_phone_number,
+        'email': clean_lowercase.__func__,
+        'gender': clean_lowercase.__func__,
+        'previously_attended_camp': ImportConfig.clean_boolean
+    }
+    
+    REQUIRED_FIELDS = ['first_name', 'last_name']
+    
+    # Everything in the form row is kept in raw_data, so nothing goes to notes
+    NOTES_FIELDS = []
+    RELATIONSHIP_COLUMNS: Dict[str, str] = {}
+    RELATIONSHIP_PATTERNS = []
@@ -2,28 +2,112 @@
 Data processing and transformation module
 Handles CSV reading, data cleaning, and transformation
 """
-import pandas as pd
+import itertools
 import logging
-from typing import Dict, List, Optional, Any, Tuple
-from config import ImportConfig
+from typing import TYPE_CHECKING, Dict, List, Optional, Any, Tuple, Iterator, Iterable
+from config import ImportConfig, is_missing
+from schema import SchemaRules
+import re
 import uuid
 from datetime import datetime
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
+# Tried in order until one decodes the file
+CSV_ENCODINGS = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
+
+# Record key holding relationship references; keys starting with '_' are never inserted
+RELATIONSHIPS_KEY = '_relationships'
+
+# Rows per DataFrame when a CSV is read in chunks
+CSV_CHUNK_ROWS = 10000
+
+class ChunkedCsvFrame:
+    """A CSV read with pandas one chunk of rows at a time.
+
+    Offers the parts of a DataFrame the processor uses (`columns`, `len()` and
+    `iterrows()`), so at most `chunk_rows` raw rows are held in memory. Opening it
+    makes one chunked pass to pick the encoding and count rows.
+    """
+
+    def __init__(self, csv_path: str, read_options: Dict[str, Any], chunk_rows: int = CSV_CHUNK_ROWS):
+        self.csv_path = csv_path
+        self.read_options = read_options
+        self.chunk_rows = chunk_rows
+        self.encoding, self.columns, self.row_count = self._scan()
+
+    def _read(self, encoding: str):
+        import pandas as pd
+        return pd.read_csv(self.csv_path, encoding=encoding, chunksize=self.chunk_rows, **self.read_options)
+
+    def _scan(self) -> Tuple[str, List[str], int]:
+        import pandas as pd
+        for encoding in CSV_ENCODINGS:
+            try:
+                columns = list(pd.read_csv(self.csv_path, encoding=encoding, nrows=0, **self.read_options).columns)
+                with self._read(encoding) as reader:
+                    row_count = sum(len(chunk) for chunk in reader)
+                return encoding, columns, row_count
+            except UnicodeDecodeError:
+                continue
+        raise Exception(f"Could not read CSV with any of the tried encodings: {CSV_ENCODINGS}")
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.row_count, len(self.columns)
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def iterrows(self) -> Iterator[Tuple[int, 'pd.Series']]:
+        # Chunks continue the same RangeIndex, so row numbers match a whole-file read
+        with self._read(self.encoding) as reader:
+            for chunk in reader:
+                yield from chunk.iterrows()
+
 class DataProcessor:
-    def __init__(self, config: ImportConfig = None):
+    # Extra pandas.read_csv arguments; cells are kept as text so phone and card
+    # numbers are not turned into floats
+    CSV_READ_OPTIONS: Dict[str, Any] = {'dtype': str}
+    
+    def __init__(self, config: ImportConfig = None, schema_rules: SchemaRules = None, import_batch_id: str = None,
+                 center_id: str = None):
         self.config = config or ImportConfig()
+        # Rules read from the live table; the built-in enum lists are used without them
+        self.schema_rules = schema_rules
+        # Tags every record of this run so the import can be counted and rolled back
+        self.import_batch_id = import_batch_id
+        # Resolved from --center by the caller, which has the database connection
+        self.center_id = center_id
     
-    def read_csv(self, csv_path: str) -> pd.DataFrame:
-        """Read CSV file with error handling"""
+    def read_csv(self, csv_path: str, chunked: bool = False) -> 'pd.DataFrame':
+        """Read CSV file with error handling.
+        
+        With `chunked`, rows are read lazily in chunks of CSV_CHUNK_ROWS (a
+        ChunkedCsvFrame) instead of loading the whole file.
+        """
+        # Imported here so the streaming engine never loads pandas
+        import pandas as pd
+        if chunked:
+            try:
+                df = ChunkedCsvFrame(csv_path, self.CSV_READ_OPTIONS)
+            except Exception as e:
+                logger.error(f"Failed to read CSV file {csv_path}: {e}")
+                raise
+            logger.info(f"Reading CSV in chunks of {df.chunk_rows} rows with {df.encoding} encoding")
+            logger.info(f"CSV shape: {df.shape}")
+            logger.info(f"Columns: {df.columns}")
+            return df
         try:
             # Try different encodings
-            encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
+            encodings = CSV_ENCODINGS
             
             for encoding in encodings:
                 try:
-                    df = pd.read_csv(csv_path, encoding=encoding)
+                    df = pd.read_csv(csv_path, encoding=encoding, **self.CSV_READ_OPTIONS)
                     logger.info(f"Successfully read CSV with {encoding} encoding")
                     logger.info(f"CSV shape: {df.shape}")
                     logger.info(f"Columns: {list(df.columns)}")
@@ -37,7 +121,7 @@ class DataProcessor:
             logger.error(f"Failed to read CSV file {csv_path}: {e}")
             raise
     
-    def validate_csv_structure(self, df: pd.DataFrame) -> Tuple[bool, List[str]]:
+    def validate_csv_structure(self, df: 'pd.DataFrame') -> Tuple[bool, List[str]]:
         """Validate CSV has expected columns"""
         errors = []
         expected_columns = set(self.config.COLUMN_MAPPINGS.keys())
@@ -57,23 +141,50 @@ class DataProcessor:
         if missing_required:
             errors.append(f"Missing required columns: {missing_required}")
         
+        errors.extend(self.check_target_fields())
+        
         return len(errors) == 0, errors
     
-    def clean_row_data(self, row: pd.Series) -> Dict[str, Any]:
+    def target_fields(self) -> List[str]:
+        """Table columns the configured mappings, defaults and required fields write to"""
+        fields = [field for field in self.config.COLUMN_MAPPINGS.values() if field is not None]
+        fields += list(self.config.DEFAULT_VALUES) + list(self.config.REQUIRED_FIELDS)
+        fields += self.stamped_fields()
+        return list(dict.fromkeys(fields))
+    
+    def stamped_fields(self) -> List[str]:
+        """Columns `stamp_record` adds to every record of this run"""
+        fields = ['id', 'createdAt', 'updatedAt']
+        if self.import_batch_id:
+            fields.append('import_batch_id')
+        if self.center_id:
+            fields.append('center_id')
+        return fields
+    
+    def check_target_fields(self) -> List[str]:
+        """Report configured fields the live table doesn't have; every row would fail on them"""
+        if not self.schema_rules:
+            return []
+        unknown = self.schema_rules.unknown_columns(self.target_fields())
+        if unknown:
+            return [f"Configured fields not in table {self.schema_rules.table}: {unknown}"]
+        return []
+    
+    def clean_row_data(self, row: 'pd.Series') -> Dict[str, Any]:
         """Clean and transform a single row of data"""
         cleaned_data = {}
         notes_parts = []
         
         # Process each column according to mappings
         for csv_column, db_field in self.config.COLUMN_MAPPINGS.items():
-            if csv_column not in row.index:
+            if csv_column not in row:
                 continue
                 
             raw_value = row[csv_column]
             
             # Skip empty/null values for unmapped columns
             if db_field is None:
-                if csv_column in self.config.NOTES_FIELDS and pd.notna(raw_value) and str(raw_value).strip():
+                if csv_column in self.config.NOTES_FIELDS and not is_missing(raw_value) and str(raw_value).strip():
                     notes_parts.append(f"{csv_column}: {raw_value}")
                 continue
             
@@ -95,11 +206,39 @@ class DataProcessor:
             else:
                 cleaned_data['notes'] = "Imported data:\n" + "\n".join(notes_parts)
         
+        # Keep relationship references for the post-import relationship stage
+        relationships = self.extract_relationships(row)
+        if relationships:
+            cleaned_data[RELATIONSHIPS_KEY] = relationships
+        
         # Add default values
         for field, default_value in self.config.DEFAULT_VALUES.items():
             if field not in cleaned_data:
                 cleaned_data[field] = default_value
         
+        return self.stamp_record(cleaned_data)
+    
+    def extract_relationships(self, row: 'pd.Series') -> List[Tuple[str, str]]:
+        """Find (relationship_type, reference) pairs in the configured columns"""
+        relationships = []
+        
+        for csv_column, relationship_type in getattr(self.config, 'RELATIONSHIP_COLUMNS', {}).items():
+            value = self._clean_string_value(row[csv_column]) if csv_column in row else None
+            if value:
+                for reference in re.split(r'[;,]', value):
+                    if reference.strip():
+                        relationships.append((relationship_type, reference.strip()))
+        
+        for csv_column, pattern, relationship_type in getattr(self.config, 'RELATIONSHIP_PATTERNS', []):
+            value = self._clean_string_value(row[csv_column]) if csv_column in row else None
+            if value:
+                for match in re.finditer(pattern, value):
+                    relationships.append((relationship_type, match.group('ref').strip()))
+        
+        return relationships
+    
+    def stamp_record(self, cleaned_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Assign a fresh id, timestamps, the run's import batch and center to a cleaned record"""
         # Generate UUID for id field
         cleaned_data['id'] = str(uuid.uuid4())
         
@@ -108,11 +247,16 @@ class DataProcessor:
         cleaned_data['createdAt'] = now
         cleaned_data['updatedAt'] = now
         
+        if self.import_batch_id:
+            cleaned_data['import_batch_id'] = self.import_batch_id
+        if self.center_id:
+            cleaned_data['center_id'] = self.center_id
+        
         return cleaned_data
     
     def _clean_string_value(self, value: Any) -> Optional[str]:
         """Clean string values"""
-        if pd.isna(value) or value is None:
+        if is_missing(value):
             return None
         
         cleaned = str(value).strip()
@@ -123,8 +267,10 @@ class DataProcessor:
         errors = []
         
         # Check required fields
+        missing_fields = []
         for field in self.config.REQUIRED_FIELDS:
             if field not in row_data or row_data[field] is None or row_data[field] == '':
+                missing_fields.append(field)
                 errors.append(f"Row {row_index}: Missing required field '{field}'")
         
         # Validate field types and constraints
@@ -139,13 +285,16 @@ class DataProcessor:
             if '@' not in email or '.' not in email.split('@')[1]:
                 errors.append(f"Row {row_index}: Invalid email format '{email}'")
         
+        if self.schema_rules:
+            errors.extend(self.schema_rules.validate(row_data, row_index, reported_missing=missing_fields))
+            return len(errors) == 0, errors
+        
         # Validate enum values
         enum_fields = {
-            'center': ['Nepal', 'USA', 'Australia', 'UK'],
             'type': ['interested', 'contact', 'sangha_member', 'attended_orientation'],
             'membershipType': ['Life Time', 'Board Member', 'General Member', 'Honorary Member'],
             'yearOfRefugeCalendarType': ['BS', 'AD'],
-            'title': ['dharma_dhar', 'sahayak_dharmacharya', 'sahayak_samathacharya'],
+            'title': ['dharma_dhar', 'sahayak_dharmacharya', 'sahayak_samathacharya', 'khenpo', 'dharmacharya'],
             'gender': ['male', 'female', 'other', 'prefer_not_to_say']
         }
         
@@ -156,49 +305,74 @@ class DataProcessor:
         
         return len(errors) == 0, errors
     
-    def process_csv_data(self, df: pd.DataFrame, skip_duplicates: bool = True) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Process entire CSV DataFrame"""
-        processed_data = []
-        all_errors = []
-        duplicate_count = 0
+    def iter_rows(self, df: 'pd.DataFrame') -> Iterator[Tuple[int, 'pd.Series']]:
+        """Yield (source row number, row) pairs; row numbers are 1-based data rows"""
+        for index, row in df.iterrows():
+            yield index + 1, row
+    
+    @staticmethod
+    def duplicate_key(row_data: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Key identifying the same person within one import"""
+        return (row_data['firstName'], row_data['lastName'], row_data.get('emailId'))
+    
+    def iter_processed_rows(self, df: 'pd.DataFrame', skip_duplicates: bool = True) -> Iterator[Tuple[int, Optional[Dict[str, Any]], List[str]]]:
+        """Clean and validate rows one at a time.
         
-        logger.info(f"Processing {len(df)} rows...")
+        Yields (row_number, cleaned_data, errors). Invalid rows carry their errors
+        and no data; skipped duplicates carry neither.
+        """
+        seen_keys = set()
+        total_rows = len(df)
         
-        for index, row in df.iterrows():
-            if (index + 1) % 50 == 0:
-                logger.info(f"Processing row {index + 1}/{len(df)}")
+        for row_number, row in self.iter_rows(df):
+            if row_number % 50 == 0:
+                logger.info(f"Processing row {row_number}/{total_rows}")
             try:
                 # Clean the row data
                 cleaned_data = self.clean_row_data(row)
                 
                 # Validate the cleaned data
-                is_valid, errors = self.validate_row_data(cleaned_data, index + 1)
+                is_valid, errors = self.validate_row_data(cleaned_data, row_number)
                 
                 if not is_valid:
-                    all_errors.extend(errors)
-                    logger.warning(f"Row {index + 1} validation failed: {errors}")
+                    logger.warning(f"Row {row_number} validation failed: {errors}")
+                    yield row_number, None, errors
                     continue
                 
                 # Check for duplicates within processed data
                 if skip_duplicates:
-                    is_duplicate = any(
-                        existing['firstName'] == cleaned_data['firstName'] and
-                        existing['lastName'] == cleaned_data['lastName'] and
-                        existing.get('emailId') == cleaned_data.get('emailId')
-                        for existing in processed_data
-                    )
-                    
-                    if is_duplicate:
-                        duplicate_count += 1
-                        logger.warning(f"Row {index + 1}: Duplicate person found, skipping")
+                    key = self.duplicate_key(cleaned_data)
+                    if key in seen_keys:
+                        logger.warning(f"Row {row_number}: Duplicate person found, skipping")
+                        yield row_number, None, []
                         continue
+                    seen_keys.add(key)
                 
-                processed_data.append(cleaned_data)
+                yield row_number, cleaned_data, []
                 
             except Exception as e:
-                error_msg = f"Row {index + 1}: Processing error - {e}"
-                all_errors.append(error_msg)
+                error_msg = f"Row {row_number}: Processing error - {e}"
                 logger.error(error_msg)
+                yield row_number, None, [error_msg]
+    
+    def process_csv_data(self, df: 'pd.DataFrame', skip_duplicates: bool = True) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Process entire CSV DataFrame"""
+        logger.info(f"Processing {len(df)} rows...")
+        return self.collect_processed_rows(self.iter_processed_rows(df, skip_duplicates))
+    
+    def collect_processed_rows(self, processed_rows: Iterable[Tuple[int, Optional[Dict[str, Any]], List[str]]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Split `iter_processed_rows` output into cleaned records and errors"""
+        processed_data = []
+        all_errors = []
+        duplicate_count = 0
+        
+        for _, cleaned_data, errors in processed_rows:
+            if errors:
+                all_errors.extend(errors)
+            elif cleaned_data is None:
+                duplicate_count += 1
+            else:
+                processed_data.append(cleaned_data)
         
         logger.info(f"Successfully processed {len(processed_data)} rows")
         logger.info(f"Skipped {duplicate_count} duplicates")
@@ -206,7 +380,7 @@ class DataProcessor:
         
         return processed_data, all_errors
     
-    def generate_preview(self, df: pd.DataFrame, num_rows: int = 5) -> str:
+    def generate_preview(self, df: 'pd.DataFrame', num_rows: int = 5) -> str:
         """Generate a preview of the data for review"""
         preview_lines = [
             "=== CSV DATA PREVIEW ===",
@@ -227,11 +401,11 @@ class DataProcessor:
         ])
         
         # Show first few rows
-        for index, row in df.head(num_rows).iterrows():
-            preview_lines.append(f"Row {index + 1}:")
+        for row_number, row in itertools.islice(self.iter_rows(df), num_rows):
+            preview_lines.append(f"Row {row_number}:")
             for col in df.columns:
                 value = row[col]
-                if pd.isna(value):
+                if is_missing(value):
                     value = "NULL"
                 elif isinstance(value, str) and len(str(value)) > 50:
                     value = str(value)[:47] + "..."
@@ -254,6 +428,8 @@ class DataProcessor:
             field_stats = {}
             for record in processed_data:
                 for field, value in record.items():
+                    if field.startswith('_'):
+                        continue
                     if field not in field_stats:
                         field_stats[field] = {'total': 0, 'non_null': 0}
                     field_stats[field]['total'] += 1
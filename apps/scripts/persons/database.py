@@ -4,15 +4,79 @@ Handles PostgreSQL connections with Docker support
 """
 import psycopg2
 import psycopg2.extras
+import psycopg2.sql
 import subprocess
 import logging
-from typing import Dict, List, Optional, Any
+import csv
+import io
+import itertools
+import json
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator, Set, Tuple
 from contextlib import contextmanager
 from config import ImportConfig
+from schema import TABLE_SCHEMA_QUERY
+from batching import FixedBatchSizer, AdaptiveBatchSizer
 
 logger = logging.getLogger(__name__)
 
+# Single-column foreign keys into person that neither cascade nor set null on delete
+NON_CASCADING_PERSON_REFERENCES_QUERY = """
+    SELECT con.conrelid::regclass::text, a.attname
+    FROM pg_constraint con
+    JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = con.conkey[1]
+    WHERE con.contype = 'f'
+      AND con.confrelid = 'public.person'::regclass
+      AND con.confdeltype IN ('a', 'r')
+      AND array_length(con.conkey, 1) = 1
+"""
+
+# psql sends these statements as one implicit transaction: the DO block refuses the
+# rollback while non-cascading references exist, then the persons are deleted and
+# (deleted persons, relationship rows) printed. Formatted with a quoted batch id.
+DOCKER_ROLLBACK_SCRIPT = """
+SET LOCAL lock_timeout = '30s';
+DO $rollback$
+DECLARE
+    ref record;
+    referencing bigint;
+    details text[] := '{{}}';
+BEGIN
+    FOR ref IN """ + NON_CASCADING_PERSON_REFERENCES_QUERY + """ LOOP
+        EXECUTE format('SELECT COUNT(*) FROM %s WHERE %I IN (SELECT id FROM person WHERE import_batch_id = $1)',
+                       ref.conrelid, ref.attname)
+            INTO referencing USING {batch}::uuid;
+        IF referencing > 0 THEN
+            details := details || format('%s in %s.%s', referencing, ref.conrelid, ref.attname);
+        END IF;
+    END LOOP;
+    IF array_length(details, 1) > 0 THEN
+        RAISE EXCEPTION 'Import batch % is still referenced (%); nothing was deleted',
+            {batch}, array_to_string(details, ', ');
+    END IF;
+END
+$rollback$;
+WITH batch AS (
+    SELECT id FROM person WHERE import_batch_id = {batch}
+), relationships AS (
+    SELECT COUNT(*) AS total FROM person_relationship pr
+    WHERE pr.person_id IN (SELECT id FROM batch) OR pr.related_person_id IN (SELECT id FROM batch)
+), deleted AS (
+    DELETE FROM person WHERE id IN (SELECT id FROM batch) RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM deleted) || '|' || (SELECT total FROM relationships);
+"""
+
 class DatabaseManager:
+    # How exported person fields are rendered so the importer's cleaners read them back
+    EXPORT_FIELD_EXPRESSIONS = {
+        'hasMembershipCard': """CASE WHEN "hasMembershipCard" THEN 'Yes' WHEN NOT "hasMembershipCard" THEN 'No' END""",
+        'title': """replace(title::text, '_', ' ')"""
+    }
+    
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or ImportConfig.DB_CONFIG
         self.connection = None
@@ -99,11 +163,51 @@ class DatabaseManager:
             logger.error(f"Docker query execution error: {e}")
             return False
     
+    def query_via_docker(self, query: str) -> str:
+        """Run a query via Docker exec and return its unaligned, tuples-only output"""
+        cmd = [
+            "docker", "exec", "-i", "server-db-1",
+            "psql", "-U", self.config['user'], "-d", self.config['database'],
+            "-At", "-v", "ON_ERROR_STOP=1", "-c", query
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        if result.returncode != 0:
+            raise RuntimeError(f"Docker query failed: {result.stderr.strip()}")
+        return result.stdout.strip()
+    
+    def fetch_table_schema(self, table: str = 'person', use_docker: bool = False) -> Dict[str, Any]:
+        """Read column types, lengths, enum values and CHECK constraints of a table from pg_catalog"""
+        if use_docker:
+            output = self.query_via_docker(TABLE_SCHEMA_QUERY % self._quote_literal(table))
+            schema = json.loads(output) if output else None
+        else:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(TABLE_SCHEMA_QUERY, (table,))
+                    row = cursor.fetchone()
+                    schema = row[0] if row else None
+        
+        if not schema:
+            raise RuntimeError(f"Table {table} not found in the public schema")
+        return schema
+
+    def find_center_id(self, name: str, use_docker: bool = False) -> Optional[str]:
+        """Id of the center with this name, or None if there is none"""
+        query = "SELECT id FROM center WHERE name = %s"
+        if use_docker:
+            output = self.query_via_docker(query % self._quote_literal(name))
+            return output.splitlines()[0] if output else None
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (name,))
+                row = cursor.fetchone()
+                return str(row[0]) if row else None
+
     def insert_person(self, person_data: Dict[str, Any], use_docker: bool = False) -> bool:
         """Insert a single person record"""
         try:
             # Build insert query dynamically based on provided fields
-            fields = list(person_data.keys())
+            fields = self._insert_fields(person_data)
             placeholders = ', '.join(['%s'] * len(fields))
             field_names = ', '.join([f'"{field}"' for field in fields])
             
@@ -147,56 +251,467 @@ class DatabaseManager:
             logger.error(f"Person data: {person_data}")
             return False
     
-    def batch_insert_persons(self, persons_data: List[Dict[str, Any]], use_docker: bool = False, batch_size: int = 100) -> Dict[str, int]:
+    def batch_insert_persons(self, persons_data: List[Dict[str, Any]], use_docker: bool = False, batch_size: int = 100,
+                             sizer: FixedBatchSizer = None) -> Dict[str, int]:
         """Insert multiple person records in batches"""
-        results = {'success': 0, 'failed': 0, 'errors': []}
+        return self.load_persons(
+            ((None, person_data) for person_data in persons_data),
+            use_docker=use_docker,
+            batch_size=batch_size,
+            sizer=sizer
+        )
+    
+    def load_persons(self, rows: Iterable[Tuple[Optional[int], Dict[str, Any]]], use_docker: bool = False, batch_size: int = 100,
+                     sizer: FixedBatchSizer = None) -> Dict[str, Any]:
+        """Insert (source row number, person record) pairs as they arrive, committing every batch.
+        
+        `sizer` picks each batch size (e.g. an AdaptiveBatchSizer); without one every
+        batch has `batch_size` rows.
+        """
+        results = {
+            'success': 0, 'failed': 0, 'errors': [], 'failed_rows': [], 'batches': 0, 'load_seconds': 0.0,
+            'aborted': False
+        }
+        rows = iter(rows)
         
         if use_docker:
+            if isinstance(sizer, AdaptiveBatchSizer):
+                logger.warning("Adaptive batch sizing has no effect with --use-docker: rows are inserted one at a time "
+                               "through psql. Use a direct connection to size batches adaptively")
             # For Docker, insert one by one (could be optimized with a temp file approach)
-            for person_data in persons_data:
-                if self.insert_person(person_data, use_docker=True):
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
-                    results['errors'].append(f"Failed to insert: {person_data.get('firstName', 'Unknown')} {person_data.get('lastName', '')}")
-        else:
-            # Use efficient batch insert for direct connection
             try:
-                with self.get_connection() as conn:
+                for row_number, person_data in rows:
+                    started = time.perf_counter()
+                    if self.insert_person(person_data, use_docker=True):
+                        results['success'] += 1
+                    else:
+                        results['failed'] += 1
+                        results['failed_rows'].append(row_number)
+                        results['errors'].append(self._insert_failure_message(row_number, person_data))
+                    results['load_seconds'] += time.perf_counter() - started
+            except Exception as e:
+                logger.error(f"Insert stopped: {e}")
+                results['errors'].append(f"Insert error: {e}")
+                results['aborted'] = True
+            return results
+        
+        # Use efficient batch insert for direct connection
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    self._load_batches(conn, cursor, rows, sizer or FixedBatchSizer(batch_size), results, commit=True)
+                        
+        except Exception as e:
+            logger.error(f"Batch insert failed: {e}")
+            results['errors'].append(f"Batch insert error: {e}")
+            # Rows after the failure were never attempted, so the import is incomplete
+            results['aborted'] = True
+        
+        return results
+    
+    def bulk_load_persons(self, rows: Iterable[Tuple[Optional[int], Dict[str, Any]]], batch_size: int = 1000,
+                          sizer: FixedBatchSizer = None) -> Dict[str, Any]:
+        """Load a large import with non-unique person indexes dropped and rebuilt afterwards.
+        
+        Everything runs in one transaction: the indexes are dropped, rows are loaded,
+        the indexes are recreated from their saved definitions and the table is
+        analyzed before a single commit. Any failure rolls the whole transaction back,
+        which restores the dropped indexes exactly. Unique and primary key indexes are
+        kept so duplicates are still rejected. The person triggers only fire on UPDATE
+        and need no special handling.
+        """
+        results = {
+            'success': 0, 'failed': 0, 'errors': [], 'failed_rows': [], 'batches': 0, 'load_seconds': 0.0,
+            'aborted': False, 'deferred_indexes': [], 'drop_seconds': 0.0, 'rebuild_seconds': 0.0, 'analyze_seconds': 0.0
+        }
+        rows = iter(rows)
+        
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    self._bulk_load(cursor, rows, sizer or FixedBatchSizer(batch_size), results)
+                    conn.commit()
+                    logger.info("Bulk load committed")
+                    
+        except Exception as e:
+            logger.error(f"Bulk load failed and was rolled back: {e}")
+            results['errors'].append(f"Bulk load error (no rows were loaded): {e}")
+            results['failed'] += results['success']
+            results['success'] = 0
+            results['aborted'] = True
+        
+        return results
+    
+    def rehearse_load(self, rows: Iterable[Tuple[Optional[int], Dict[str, Any]]], batch_size: int = 100,
+                      sizer: FixedBatchSizer = None, bulk_load: bool = False) -> Dict[str, Any]:
+        """Run the real load path in a transaction that is always rolled back, measuring its cost"""
+        results = {
+            'success': 0, 'failed': 0, 'errors': [], 'failed_rows': [], 'constraint_failures': {},
+            'batches': 0, 'load_seconds': 0.0, 'rehearsal': True
+        }
+        if bulk_load:
+            results.update({'deferred_indexes': [], 'drop_seconds': 0.0, 'rebuild_seconds': 0.0, 'analyze_seconds': 0.0})
+        # Kept so the baseline can replay the rows that loaded
+        rows = list(rows)
+        sizer = sizer or FixedBatchSizer(batch_size)
+        
+        try:
+            results['commit_latency_seconds'] = self._measure_commit_latency()
+            with self.get_connection() as conn:
+                try:
                     with conn.cursor() as cursor:
-                        for i in range(0, len(persons_data), batch_size):
-                            batch = persons_data[i:i + batch_size]
-                            
-                            for person_data in batch:
-                                try:
-                                    fields = list(person_data.keys())
-                                    placeholders = ', '.join(['%s'] * len(fields))
-                                    field_names = ', '.join([f'"{field}"' for field in fields])
-                                    
-                                    query = f"""
-                                        INSERT INTO person ({field_names})
-                                        VALUES ({placeholders})
-                                    """
-                                    
-                                    values = tuple(person_data[field] for field in fields)
-                                    cursor.execute(query, values)
-                                    results['success'] += 1
-                                    
-                                except Exception as e:
-                                    results['failed'] += 1
-                                    error_msg = f"Failed to insert {person_data.get('firstName', 'Unknown')} {person_data.get('lastName', '')}: {e}"
-                                    results['errors'].append(error_msg)
-                                    logger.error(error_msg)
-                            
-                            conn.commit()
-                            logger.info(f"Committed batch {i//batch_size + 1}")
-                            
+                        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+                        if bulk_load:
+                            table = self._create_bulk_rehearsal_table(cursor, results)
+                        cursor.execute("SELECT pg_current_wal_insert_lsn()")
+                        wal_start = cursor.fetchone()[0]
+                        index_sizes = self._person_index_sizes(cursor)
+                        
+                        if bulk_load:
+                            self._bulk_load(cursor, iter(rows), sizer, results, table=table)
+                        else:
+                            self._load_batches(conn, cursor, iter(rows), sizer, results, commit=False)
+                        
+                        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", (wal_start,))
+                        results['wal_bytes'] = int(cursor.fetchone()[0])
+                        results['index_growth_bytes'] = {
+                            name: size - index_sizes.get(name, 0)
+                            for name, size in self._person_index_sizes(cursor).items()
+                        }
+                        
+                        if not bulk_load:
+                            failed = set(results['failed_rows'])
+                            loaded = [row for row in rows if row[0] is None or row[0] not in failed]
+                            batch_sizes = [size for size, _, _ in sizer.history]
+                            results['baseline_seconds'] = self._time_heap_baseline(cursor, loaded, batch_sizes)
+                finally:
+                    conn.rollback()
+                    logger.info("Rehearsal rolled back - no data was changed")
+        except Exception as e:
+            logger.error(f"Rehearsal failed: {e}")
+            results['errors'].append(f"Rehearsal error: {e}")
+        
+        return results
+    
+    def _measure_commit_latency(self, samples: int = 5) -> float:
+        """Median time of a commit that writes and flushes a commit record but changes no rows"""
+        timings = []
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                for _ in range(samples):
+                    started = time.perf_counter()
+                    # Assigning a transaction id makes the commit flush WAL like a real batch commit
+                    cursor.execute("SELECT txid_current()")
+                    conn.commit()
+                    timings.append(time.perf_counter() - started)
+        return sorted(timings)[len(timings) // 2]
+    
+    def _person_index_sizes(self, cursor) -> Dict[str, int]:
+        """On-disk size in bytes of every person index"""
+        cursor.execute("""
+            SELECT i.relname, pg_relation_size(ix.indexrelid)
+            FROM pg_index ix
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            WHERE ix.indrelid = 'public.person'::regclass
+        """)
+        return dict(cursor.fetchall())
+    
+    def _time_heap_baseline(self, cursor, rows: List[Tuple[Optional[int], Dict[str, Any]]], batch_sizes: List[int]) -> float:
+        """Insert `rows` into an index-, foreign key- and trigger-free copy of person with the same batches"""
+        # A regular table, so its inserts write WAL like person's; the rollback drops it
+        cursor.execute("CREATE TABLE person_rehearsal_baseline (LIKE person INCLUDING DEFAULTS)")
+        results = {'success': 0, 'failed': 0, 'errors': []}
+        rows = iter(rows)
+        started = time.perf_counter()
+        for size in batch_sizes:
+            batch = list(itertools.islice(rows, size))
+            if batch:
+                self._insert_batch(cursor, batch, results, table='person_rehearsal_baseline')
+        return time.perf_counter() - started
+    
+    def _create_bulk_rehearsal_table(self, cursor, results: Dict[str, Any]) -> str:
+        """Copy person, rows included, for a bulk load rehearsal; the rollback drops the copy.
+        
+        Reading person only takes a share lock, so the server keeps using the live table.
+        """
+        started = time.perf_counter()
+        cursor.execute("CREATE TABLE person_rehearsal_bulk (LIKE person INCLUDING ALL)")
+        # Existing rows make unique checks and index rebuild times match the real load
+        cursor.execute("INSERT INTO person_rehearsal_bulk SELECT * FROM person")
+        results['copy_seconds'] = time.perf_counter() - started
+        logger.info(f"Copied person for the bulk load rehearsal in {results['copy_seconds']:.2f}s")
+        return 'person_rehearsal_bulk'
+    
+    def _bulk_load(self, cursor, rows: Iterator[Tuple[Optional[int], Dict[str, Any]]], sizer: FixedBatchSizer,
+                   results: Dict[str, Any], table: str = 'person'):
+        """Drop deferrable indexes, load, rebuild and analyze without committing"""
+        # Fail fast instead of queueing behind live traffic for the exclusive lock
+        cursor.execute("SET LOCAL lock_timeout = '30s'")
+        # Index builds sort in memory up to this limit
+        cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+        # DROP INDEX would take this lock anyway; taking it first makes the wait explicit and bounded
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        logger.warning(f"{table} is locked against all reads and writes until the bulk load commits or rolls back")
+        index_definitions = self._deferrable_indexes(cursor, table)
+        results['deferred_indexes'] = [name for name, _ in index_definitions]
+        
+        started = time.perf_counter()
+        for name, _ in index_definitions:
+            cursor.execute(f'DROP INDEX public."{name}"')
+        results['drop_seconds'] = time.perf_counter() - started
+        logger.info(f"Deferred {len(index_definitions)} {table} indexes: {results['deferred_indexes']}")
+        
+        self._load_batches(cursor.connection, cursor, rows, sizer, results, commit=False, table=table)
+        
+        started = time.perf_counter()
+        for name, definition in index_definitions:
+            logger.info(f"Rebuilding index {name}")
+            cursor.execute(definition)
+        results['rebuild_seconds'] = time.perf_counter() - started
+        
+        if self._deferrable_indexes(cursor, table) != index_definitions:
+            raise RuntimeError(f"Rebuilt {table} indexes do not match the original definitions")
+        
+        started = time.perf_counter()
+        cursor.execute(f"ANALYZE {table}")
+        results['analyze_seconds'] = time.perf_counter() - started
+    
+    def _deferrable_indexes(self, cursor, table: str = 'person') -> List[Tuple[str, str]]:
+        """Names and definitions of the table's indexes that do not enforce a constraint"""
+        cursor.execute("""
+            SELECT i.relname, pg_get_indexdef(ix.indexrelid)
+            FROM pg_index ix
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            WHERE ix.indrelid = %s::regclass
+              AND NOT ix.indisunique
+              AND NOT ix.indisprimary
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = ix.indexrelid)
+            ORDER BY i.relname
+        """, (f'public.{table}',))
+        return [(name, definition) for name, definition in cursor.fetchall()]
+    
+    def _load_batches(self, conn, cursor, rows: Iterator[Tuple[Optional[int], Dict[str, Any]]], sizer: FixedBatchSizer,
+                      results: Dict[str, Any], commit: bool = True, table: str = 'person'):
+        """Insert rows in batches sized by `sizer`, optionally committing after each one"""
+        while True:
+            batch = list(itertools.islice(rows, sizer.next_size()))
+            if not batch:
+                break
+            
+            failed_before = results['failed']
+            started = time.perf_counter()
+            self._insert_batch(cursor, batch, results, table=table)
+            if commit:
+                conn.commit()
+            elapsed = time.perf_counter() - started
+            sizer.record(len(batch), elapsed, results['failed'] - failed_before)
+            results['load_seconds'] += elapsed
+            results['batches'] += 1
+            logger.info(f"{'Committed' if commit else 'Loaded'} batch {results['batches']} "
+                        f"({len(batch)} rows in {elapsed:.3f}s)")
+        results['batching'] = sizer.summary()
+    
+    def _insert_batch(self, cursor, batch: List[Tuple[Optional[int], Dict[str, Any]]], results: Dict[str, Any],
+                      table: str = 'person'):
+        """Insert one batch with multi-row statements, falling back to row by row on failure"""
+        # Cleaned records only carry non-null fields, so group rows sharing a column list
+        groups: Dict[Tuple[str, ...], List[Tuple[Optional[int], Dict[str, Any]]]] = {}
+        for row_number, person_data in batch:
+            groups.setdefault(tuple(self._insert_fields(person_data)), []).append((row_number, person_data))
+        
+        cursor.execute("SAVEPOINT person_batch")
+        try:
+            for fields, group in groups.items():
+                field_names = ', '.join([f'"{field}"' for field in fields])
+                psycopg2.extras.execute_values(
+                    cursor,
+                    f"INSERT INTO {table} ({field_names}) VALUES %s",
+                    [tuple(person_data[field] for field in fields) for _, person_data in group],
+                    page_size=len(group)
+                )
+            cursor.execute("RELEASE SAVEPOINT person_batch")
+            results['success'] += len(batch)
+            return
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT person_batch")
+            logger.warning(f"Batch of {len(batch)} rows failed ({e}), retrying row by row")
+        
+        # Isolate the failing rows so the rest of the batch still lands
+        for row_number, person_data in batch:
+            fields = self._insert_fields(person_data)
+            placeholders = ', '.join(['%s'] * len(fields))
+            field_names = ', '.join([f'"{field}"' for field in fields])
+            
+            cursor.execute("SAVEPOINT person_row")
+            try:
+                cursor.execute(
+                    f"INSERT INTO {table} ({field_names}) VALUES ({placeholders})",
+                    tuple(person_data[field] for field in fields)
+                )
+                cursor.execute("RELEASE SAVEPOINT person_row")
+                results['success'] += 1
             except Exception as e:
-                logger.error(f"Batch insert failed: {e}")
-                results['errors'].append(f"Batch insert error: {e}")
+                cursor.execute("ROLLBACK TO SAVEPOINT person_row")
+                results['failed'] += 1
+                results.setdefault('failed_rows', []).append(row_number)
+                # Tally by constraint so a rehearsal can say which rules the file breaks
+                constraint = getattr(getattr(e, 'diag', None), 'constraint_name', None) or type(e).__name__
+                failures = results.setdefault('constraint_failures', {})
+                failures[constraint] = failures.get(constraint, 0) + 1
+                error_msg = self._insert_failure_message(row_number, person_data, e)
+                results['errors'].append(error_msg)
+                logger.error(error_msg)
+    
+    @staticmethod
+    def _insert_fields(person_data: Dict[str, Any]) -> List[str]:
+        """Columns to insert; keys starting with '_' carry processing metadata"""
+        return [field for field in person_data if not field.startswith('_')]
+    
+    @staticmethod
+    def _insert_failure_message(row_number: Optional[int], person_data: Dict[str, Any], error: Exception = None) -> str:
+        """Describe a failed insert, prefixed with the source row number when known"""
+        message = f"Failed to insert {person_data.get('firstName', 'Unknown')} {person_data.get('lastName', '')}"
+        if error is not None:
+            message += f": {error}"
+        if row_number is not None:
+            message = f"Row {row_number}: {message}"
+        return message
+    
+    def load_registrations(self, rows: List[Tuple[Optional[int], Dict[str, Any]]], columns: List[str],
+                           dupe_key: Callable[[Dict[str, Any]], Tuple[Any, ...]]) -> Dict[str, Any]:
+        """Insert registrations not already in the table with one duplicate check and one COPY.
+        
+        `dupe_key` must normalize a record the way idx_registration_dupe_key does.
+        The check and the COPY share a transaction holding a lock that only other
+        writers wait for, so two imports of the same export cannot both insert a row.
+        COPY is all or nothing: a bad row fails the load, and the error names its
+        source row.
+        """
+        results = {
+            'success': 0, 'failed': 0, 'skipped_existing': 0, 'errors': [],
+            'check_seconds': 0.0, 'load_seconds': 0.0
+        }
+        if not rows:
+            return results
+        
+        new_rows = []
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SET LOCAL lock_timeout = '30s'")
+                    cursor.execute("LOCK TABLE registration IN SHARE ROW EXCLUSIVE MODE")
+                    
+                    started = time.perf_counter()
+                    existing = self._existing_registration_keys(cursor, [dupe_key(record) for _, record in rows])
+                    results['check_seconds'] = time.perf_counter() - started
+                    new_rows = [row for position, row in enumerate(rows) if position not in existing]
+                    results['skipped_existing'] = len(existing)
+                    logger.info(f"{len(existing)} of {len(rows)} registrations already exist "
+                                f"(checked in {results['check_seconds']:.3f}s)")
+                    
+                    if new_rows:
+                        started = time.perf_counter()
+                        buffer = io.StringIO()
+                        writer = csv.writer(buffer)
+                        for _, record in new_rows:
+                            writer.writerow([self._copy_value(record.get(column)) for column in columns])
+                        buffer.seek(0)
+                        field_names = ', '.join([f'"{column}"' for column in columns])
+                        cursor.copy_expert(f"COPY registration ({field_names}) FROM STDIN WITH (FORMAT csv)", buffer)
+                        results['load_seconds'] = time.perf_counter() - started
+                    
+                    conn.commit()
+                    results['success'] = len(new_rows)
+                    
+        except Exception as e:
+            logger.error(f"Registration load failed and was rolled back: {e}")
+            message = f"Registration load error (no rows were loaded): {e}"
+            match = re.search(r'COPY registration, line (\d+)', str(e))
+            if match and int(match.group(1)) <= len(new_rows):
+                row_number = new_rows[int(match.group(1)) - 1][0]
+                if row_number is not None:
+                    message = f"Row {row_number}: {message}"
+            results['errors'].append(message)
+            results['failed'] = len(new_rows) or len(rows)
         
         return results
     
+    def _existing_registration_keys(self, cursor, keys: List[Tuple[Any, ...]]) -> Set[int]:
+        """Positions in `keys` of (src_timestamp, first, last, phone, email) keys already registered.
+        
+        Both lookups match idx_registration_dupe_key column for column, so each key is
+        one index probe. NULL timestamps get their own IS NULL probe because = never
+        matches NULL.
+        """
+        timestamps, first_names, last_names, phones, emails = (list(column) for column in zip(*keys))
+        cursor.execute("""
+            SELECT k.position - 1
+            FROM unnest(%s::timestamptz[], %s::text[], %s::text[], %s::text[], %s::text[])
+                WITH ORDINALITY AS k(src_timestamp, first_name, last_name, phone, email, position)
+            WHERE EXISTS (
+                    SELECT 1 FROM registration r
+                    WHERE r.src_timestamp = k.src_timestamp
+                      AND LOWER(TRIM(r.first_name)) = k.first_name
+                      AND LOWER(TRIM(r.last_name)) = k.last_name
+                      AND COALESCE(TRIM(r.phone), '') = k.phone
+                      AND COALESCE(LOWER(TRIM(r.email)), '') = k.email
+                )
+               OR (k.src_timestamp IS NULL AND EXISTS (
+                    SELECT 1 FROM registration r
+                    WHERE r.src_timestamp IS NULL
+                      AND LOWER(TRIM(r.first_name)) = k.first_name
+                      AND LOWER(TRIM(r.last_name)) = k.last_name
+                      AND COALESCE(TRIM(r.phone), '') = k.phone
+                      AND COALESCE(LOWER(TRIM(r.email)), '') = k.email
+                ))
+        """, (timestamps, first_names, last_names, phones, emails))
+        return {position for (position,) in cursor.fetchall()}
+    
+    @staticmethod
+    def _copy_value(value: Any) -> Any:
+        """Render a value for COPY's CSV format; None is written unquoted, which COPY reads as NULL"""
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+    
+    def iter_person_index_rows(self) -> Iterator[Tuple[Any, ...]]:
+        """Stream (id, firstName, middleName, lastName, emailId, primaryPhone, secondaryPhone, phoneNumber) for all persons"""
+        with self.get_connection() as conn:
+            # Server-side cursor: rows arrive in chunks instead of all at once
+            with conn.cursor(name='person_index') as cursor:
+                cursor.itersize = 5000
+                cursor.execute("""
+                    SELECT id, "firstName", "middleName", "lastName", "emailId",
+                           "primaryPhone", "secondaryPhone", "phoneNumber"
+                    FROM person
+                """)
+                yield from cursor
+    
+    def insert_relationships(self, relationships: List[Tuple[str, str, str]], created_by: str) -> int:
+        """Insert (person_id, related_person_id, relationship_type) rows in one statement, skipping existing pairs"""
+        if not relationships:
+            return 0
+        person_ids, related_ids, relationship_types = (list(column) for column in zip(*relationships))
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO person_relationship
+                        (person_id, related_person_id, relationship_type, created_by, last_updated_by)
+                    SELECT person_id, related_person_id, relationship_type, %s, %s
+                    FROM unnest(%s::uuid[], %s::uuid[], %s::varchar[])
+                        AS r(person_id, related_person_id, relationship_type)
+                    ON CONFLICT (person_id, related_person_id) DO NOTHING
+                """, (created_by, created_by, person_ids, related_ids, relationship_types))
+                inserted = cursor.rowcount
+                conn.commit()
+                return inserted
+    
     def check_existing_person(self, first_name: str, last_name: str, email: str = None) -> bool:
         """Check if person already exists in database"""
         try:
@@ -218,24 +733,154 @@ class DatabaseManager:
             logger.error(f"Failed to check existing person: {e}")
             return False
     
-    def get_stats(self) -> Dict[str, int]:
-        """Get database statistics"""
+    def get_stats(self, import_batch_id: str = None, use_docker: bool = False) -> Dict[str, int]:
+        """Get database statistics without scanning the person table.
+        
+        The total comes from planner statistics; the batch count uses idx_person_import_batch.
+        """
+        estimate_query = "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE oid = 'public.person'::regclass"
+        batch_query = "SELECT COUNT(*) FROM person WHERE import_batch_id = %s"
+        try:
+            if use_docker:
+                estimated_total = int(self.query_via_docker(estimate_query) or 0)
+                batch_persons = int(self.query_via_docker(batch_query % self._quote_literal(import_batch_id))) \
+                    if import_batch_id else 0
+            else:
+                with self.get_connection() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(estimate_query)
+                        estimated_total = cursor.fetchone()[0]
+                        
+                        batch_persons = 0
+                        if import_batch_id:
+                            cursor.execute(batch_query, (import_batch_id,))
+                            batch_persons = cursor.fetchone()[0]
+            
+            return {
+                'estimated_total_persons': estimated_total,
+                'batch_persons': batch_persons
+            }
+        except Exception as e:
+            logger.error(f"Failed to get stats: {e}")
+            return {'estimated_total_persons': 0, 'batch_persons': 0}
+    
+    def rollback_import(self, import_batch_id: str, use_docker: bool = False) -> Dict[str, Any]:
+        """Delete every person of an import batch, and their dependent links, in one transaction.
+        
+        Relationships, group and center memberships, empowerments and mahakrama
+        history go with the persons through their ON DELETE CASCADE foreign keys.
+        References without a cascade (event attendance, user accounts, instructor
+        links) block the rollback, which is then refused without deleting anything.
+        """
+        # Batch ids are generated UUIDs; checking keeps them safe to quote into the psql script
+        import_batch_id = str(uuid.UUID(import_batch_id))
+        
+        if use_docker:
+            output = self.query_via_docker(DOCKER_ROLLBACK_SCRIPT.format(batch=self._quote_literal(import_batch_id)))
+            deleted, relationships = (int(count) for count in output.splitlines()[-1].split('|'))
+            logger.info(f"Rolled back import batch {import_batch_id}: {deleted} persons, {relationships} relationship rows")
+            return {'persons': deleted, 'relationships': relationships}
+        
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = '30s'")
+                
+                blocking = self._blocking_references(cursor, import_batch_id)
+                if blocking:
+                    conn.rollback()
+                    details = ', '.join(f"{count} in {table}.{column}" for table, column, count in blocking)
+                    raise RuntimeError(f"Import batch {import_batch_id} is still referenced ({details}); nothing was deleted")
+                
+                cursor.execute("""
+                    SELECT COUNT(*) FROM person_relationship pr
+                    WHERE pr.person_id IN (SELECT id FROM person WHERE import_batch_id = %s)
+                       OR pr.related_person_id IN (SELECT id FROM person WHERE import_batch_id = %s)
+                """, (import_batch_id, import_batch_id))
+                relationships = cursor.fetchone()[0]
+                
+                cursor.execute("DELETE FROM person WHERE import_batch_id = %s", (import_batch_id,))
+                deleted = cursor.rowcount
+                conn.commit()
+        
+        logger.info(f"Rolled back import batch {import_batch_id}: {deleted} persons, {relationships} relationship rows")
+        return {'persons': deleted, 'relationships': relationships}
+    
+    def _blocking_references(self, cursor, import_batch_id: str) -> List[Tuple[str, str, int]]:
+        """(table, column, row count) of non-cascading foreign keys pointing at the batch's persons"""
+        cursor.execute(NON_CASCADING_PERSON_REFERENCES_QUERY)
+        blocking = []
+        for table, column in cursor.fetchall():
+            cursor.execute(
+                psycopg2.sql.SQL(
+                    "SELECT COUNT(*) FROM {} WHERE {} IN (SELECT id FROM person WHERE import_batch_id = %s)"
+                ).format(psycopg2.sql.SQL(table), psycopg2.sql.Identifier(column)),
+                (import_batch_id,)
+            )
+            count = cursor.fetchone()[0]
+            if count:
+                blocking.append((table, column, count))
+        return blocking
+    
+    def export_persons(self, output_path: str, created_by: str = None, center: str = None, use_docker: bool = False) -> Optional[int]:
+        """Stream person rows to a CSV file in the importer's column layout.
+        
+        Uses COPY ... TO STDOUT so rows go straight from the server to the file.
+        Returns the number of exported rows (None when it is not reported, as with Docker).
+        """
+        select_list = []
+        for csv_column, db_field in ImportConfig.COLUMN_MAPPINGS.items():
+            header = csv_column.replace('"', '""')
+            if db_field is None:
+                select_list.append(f'NULL AS "{header}"')
+            else:
+                expression = self.EXPORT_FIELD_EXPRESSIONS.get(db_field, f'"{db_field}"')
+                select_list.append(f'{expression} AS "{header}"')
+        
+        conditions = []
+        params = []
+        if created_by:
+            conditions.append('"createdBy" = %s')
+            params.append(created_by)
+        if center:
+            conditions.append("center_id IN (SELECT id FROM center WHERE name = %s)")
+            params.append(center)
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        query = f"""
+            SELECT {', '.join(select_list)}
+            FROM person
+            {where_clause}
+            ORDER BY "createdAt", id
+        """
+        
         try:
+            if use_docker:
+                copy_sql = f"COPY ({query % tuple(self._quote_literal(p) for p in params)}) TO STDOUT WITH (FORMAT csv, HEADER)"
+                cmd = [
+                    "docker", "exec", "-i", "server-db-1",
+                    "psql", "-U", self.config['user'], "-d", self.config['database'],
+                    "-v", "ON_ERROR_STOP=1", "-c", copy_sql
+                ]
+                with open(output_path, 'wb') as output:
+                    result = subprocess.run(cmd, stdout=output, stderr=subprocess.PIPE, text=False)
+                if result.returncode != 0:
+                    raise RuntimeError(result.stderr.decode(errors='replace').strip())
+                return None
+            
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT COUNT(*) FROM person")
-                    total_persons = cursor.fetchone()[0]
-                    
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM person 
-                        WHERE "createdBy" = 'csv_import_script'
-                    """)
-                    imported_persons = cursor.fetchone()[0]
-                    
-                    return {
-                        'total_persons': total_persons,
-                        'imported_persons': imported_persons
-                    }
+                    copy_sql = f"COPY ({cursor.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+                    with open(output_path, 'w', encoding='utf-8', newline='') as output:
+                        cursor.copy_expert(copy_sql, output)
+                    return cursor.rowcount
         except Exception as e:
-            logger.error(f"Failed to get stats: {e}")
-            return {'total_persons': 0, 'imported_persons': 0}
\ No newline at end of file
+            logger.error(f"Failed to export persons: {e}")
+            raise
+    
+    @staticmethod
+    def _quote_literal(value: Any) -> str:
+        """Render a value as an SQL literal for queries sent through psql"""
+        if value is None:
+            return 'NULL'
+        escaped_value = str(value).replace("'", "''")
+        return f"'{escaped_value}'"
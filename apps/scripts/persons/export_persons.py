@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Script for exporting persons from the database to CSV
+Writes the same column layout that import_persons.py reads
+"""
+import argparse
+import logging
+import sys
+import time
+
+from config import ImportConfig
+from import_persons import setup_logging
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Export persons from database to CSV')
+    parser.add_argument('output_file', help='Path of the CSV file to write')
+    parser.add_argument('--created-by',
+                       help='Only export persons with this createdBy value (e.g. csv_import_script)')
+    parser.add_argument('--center',
+                       help='Only export persons assigned to the center with this name')
+    parser.add_argument('--use-docker', action='store_true',
+                       help='Use Docker to connect to database')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                       default='INFO', help='Logging level')
+    parser.add_argument('--log-file', help='Log file path (optional)')
+
+    args = parser.parse_args()
+
+    setup_logging(args.log_level, args.log_file)
+    logger = logging.getLogger(__name__)
+
+    logger.info("=== PERSONS CSV EXPORT STARTED ===" + "="*50)
+    logger.info(f"Output file: {args.output_file}")
+    logger.info(f"Created by filter: {args.created_by}")
+    logger.info(f"Center filter: {args.center}")
+
+    try:
+        try:
+            from database import DatabaseManager
+        except ImportError as e:
+            logger.error(f"Database module import failed: {e}")
+            logger.error("Install psycopg2-binary for database functionality: pip install psycopg2-binary")
+            return 1
+
+        db_manager = DatabaseManager(ImportConfig.DB_CONFIG)
+
+        started = time.perf_counter()
+        exported = db_manager.export_persons(
+            args.output_file,
+            created_by=args.created_by,
+            center=args.center,
+            use_docker=args.use_docker
+        )
+        elapsed = time.perf_counter() - started
+
+        if exported is None:
+            logger.info(f"Export written to {args.output_file} in {elapsed:.2f}s")
+        else:
+            rate = exported / elapsed if elapsed > 0 else 0
+            logger.info(f"Exported {exported} persons to {args.output_file} in {elapsed:.2f}s ({rate:.0f} rows/s)")
+
+        logger.info("=== EXPORT COMPLETED ===" + "="*50)
+        return 0
+
+    except KeyboardInterrupt:
+        logger.info("\\nExport cancelled by user")
+        return 1
+    except Exception as e:
+        logger.error(f"Export failed with error: {e}")
+        logger.exception("Full error details:")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,11 +7,18 @@ import argparse
 import logging
 import sys
 import os
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from config import ImportConfig
 from data_processor import DataProcessor
+from cache import ProcessingCache
+from schema import SchemaRules
+from batching import FixedBatchSizer, AdaptiveBatchSizer, format_batching_report
+from streaming import StreamingDataProcessor
+from multi_file import expand_csv_paths, process_files, merge_files, format_file_report
 
 # Import database manager only when needed
 DatabaseManager = None
@@ -36,14 +43,14 @@ def setup_logging(log_level: str = 'INFO', log_file: str = None):
         file_handler.setFormatter(logging.Formatter(log_format))
         logging.getLogger().addHandler(file_handler)
 
-def validate_environment(preview_only=False, use_docker=False):
+def validate_environment(csv_paths, preview_only=False, use_docker=False):
     """Validate the environment and dependencies"""
     errors = []
     
-    # Check if CSV file exists
-    csv_path = "Membership Byoma Kusuma.csv"
-    if not os.path.exists(csv_path):
-        errors.append(f"CSV file not found: {csv_path}")
+    # Check the CSV files exist
+    for csv_path in csv_paths:
+        if not os.path.exists(csv_path):
+            errors.append(f"CSV file not found: {csv_path}")
     
     # Only check Docker if using Docker mode and not preview-only
     if use_docker and not preview_only:
@@ -59,12 +66,354 @@ def validate_environment(preview_only=False, use_docker=False):
     
     return errors
 
+def load_schema_rules(args, db_manager, logger, table: str = 'person') -> Optional[SchemaRules]:
+    """Read validation rules from the live table, falling back to the local copy"""
+    if db_manager is None and args.refresh_schema:
+        try:
+            from database import DatabaseManager
+            db_manager = DatabaseManager(ImportConfig.DB_CONFIG)
+        except ImportError as e:
+            logger.warning(f"Cannot refresh schema without the database module: {e}")
+    
+    if db_manager is not None:
+        try:
+            schema_rules = SchemaRules(db_manager.fetch_table_schema(table, use_docker=args.use_docker))
+            schema_rules.save(args.schema_file)
+            logger.info(f"Loaded {table} schema from database ({len(schema_rules.columns)} columns, "
+                        f"{len(schema_rules.checks)} checks), cached in {args.schema_file}")
+            return schema_rules
+        except Exception as e:
+            logger.warning(f"Could not read {table} schema from database: {e}")
+    
+    schema_rules = SchemaRules.load(args.schema_file)
+    if schema_rules:
+        logger.info(f"Validating against cached {table} schema from {args.schema_file}")
+    else:
+        logger.info(f"No {table} schema available - validating with built-in rules only")
+    return schema_rules
+
+def make_data_processor(args, config: ImportConfig, schema_rules: Optional[SchemaRules] = None,
+                        import_batch_id: Optional[str] = None, center_id: Optional[str] = None) -> DataProcessor:
+    """Processor for the selected --engine; both produce the same records"""
+    processor_class = StreamingDataProcessor if args.engine == 'csv' else DataProcessor
+    return processor_class(config, schema_rules, import_batch_id, center_id)
+
+def resolve_center(args, db_manager, logger) -> Optional[str]:
+    """Look up the --center name; returns None when no center is assigned"""
+    if not args.center:
+        logger.info("No center given - person.center_id is left empty")
+        return None
+    center_id = db_manager.find_center_id(args.center, use_docker=args.use_docker)
+    if center_id is None:
+        raise ValueError(f"Center '{args.center}' not found in the center table; create it first, "
+                         f"or pass --center '' to import without a center")
+    logger.info(f"Assigning imported persons to center {args.center} ({center_id})")
+    return center_id
+
+def make_batch_sizer(args) -> FixedBatchSizer:
+    """Fixed --batch-size, or adaptive sizing starting from it"""
+    if args.adaptive_batching:
+        return AdaptiveBatchSizer(initial_size=args.batch_size, target_seconds=args.target_batch_seconds)
+    return FixedBatchSizer(args.batch_size)
+
+def log_bulk_load_report(results: Dict[str, Any], logger):
+    """Report how a bulk load split its time between loading and index maintenance"""
+    total = results['drop_seconds'] + results['load_seconds'] + results['rebuild_seconds'] + results['analyze_seconds']
+    logger.info("BULK LOAD TIMINGS:")
+    logger.info(f"  Deferred indexes: {len(results['deferred_indexes'])} ({', '.join(results['deferred_indexes'])})")
+    for label, key in (("Dropping indexes", 'drop_seconds'), ("Loading rows", 'load_seconds'),
+                       ("Rebuilding indexes", 'rebuild_seconds'), ("ANALYZE", 'analyze_seconds')):
+        share = results[key] / total * 100 if total > 0 else 0
+        logger.info(f"  {label}: {results[key]:.2f}s ({share:.0f}%)")
+
+def run_relationship_stage(config: ImportConfig, db_manager, processed_rows, logger) -> bool:
+    """Resolve relationship references against all persons and insert them in one statement"""
+    from relationships import PersonIndex, RelationshipResolver
+    
+    references = RelationshipResolver.collect_references(processed_rows)
+    logger.info(f"Resolving {len(references)} relationship references...")
+    if not references:
+        return True
+    
+    try:
+        person_index = PersonIndex.from_rows(db_manager.iter_person_index_rows())
+        relationships, rejects = RelationshipResolver(person_index, config).resolve(references)
+        inserted = db_manager.insert_relationships(relationships, config.DEFAULT_VALUES['createdBy'])
+    except Exception as e:
+        logger.error(f"Relationship import failed: {e}")
+        return False
+    
+    logger.info("RELATIONSHIP RESULTS:")
+    logger.info(f"  Persons indexed: {len(person_index.ids)}")
+    logger.info(f"  Resolved references: {len(references) - len(rejects)}")
+    logger.info(f"  Relationship rows inserted: {inserted} (both directions, existing pairs skipped)")
+    if rejects:
+        logger.warning(f"  Rejected references: {len(rejects)}")
+        for reject in rejects[:10]:
+            logger.warning(f"  - {reject}")
+        if len(rejects) > 10:
+            logger.warning(f"  ... and {len(rejects) - 10} more rejected references")
+    return True
+
+def log_import_counts(import_results: Dict[str, Any], final_stats: Dict[str, int], import_batch_id: str, logger):
+    """Report the loader's own counts and the indexed count of the batch"""
+    logger.info(f"  Successfully imported: {import_results['success']} records")
+    logger.info(f"  Failed imports: {import_results['failed']} records")
+    logger.info(f"  Import batch: {import_batch_id} ({final_stats['batch_persons']} persons tagged)")
+    logger.info(f"  Persons in database (estimate): {final_stats['estimated_total_persons']}")
+    logger.info(f"  Undo with: python import_persons.py --rollback {import_batch_id}")
+
+def run_rollback(args, db_manager, logger) -> int:
+    """Delete all persons of an earlier import batch"""
+    try:
+        uuid.UUID(args.rollback)
+    except ValueError:
+        logger.error(f"Not an import batch id: {args.rollback}")
+        return 1
+    
+    stats = db_manager.get_stats(args.rollback, use_docker=args.use_docker)
+    if not stats['batch_persons']:
+        logger.error(f"No persons found for import batch {args.rollback}")
+        return 1
+    
+    if not args.force:
+        response = input(f"Delete {stats['batch_persons']} persons of import batch {args.rollback} "
+                         f"and their relationships and memberships? (y/N): ")
+        if response.lower() != 'y':
+            logger.info("Rollback cancelled by user")
+            return 0
+    
+    try:
+        removed = db_manager.rollback_import(args.rollback, use_docker=args.use_docker)
+    except Exception as e:
+        logger.error(f"Rollback failed: {e}")
+        return 1
+    
+    logger.info(f"Removed {removed['persons']} persons and {removed['relationships']} relationship rows")
+    return 0
+
+def log_rehearsal_report(results: Dict[str, Any], bulk_load: bool, logger):
+    """Report what a rehearsed load found and what the real import would cost"""
+    if 'copy_seconds' in results:
+        logger.info(f"  Rehearsed against a copy of person (copied in {results['copy_seconds']:.2f}s, "
+                    f"not part of the projection); foreign keys were not checked")
+    logger.info(f"  Rows that would load: {results['success']}")
+    logger.info(f"  Rows that would fail: {results['failed']}")
+    for constraint, count in sorted(results['constraint_failures'].items(), key=lambda item: -item[1]):
+        logger.info(f"    {constraint}: {count}")
+    
+    load_seconds = results['load_seconds']
+    attempted = results['success'] + results['failed']
+    if load_seconds > 0:
+        logger.info(f"  Insert throughput: {attempted / load_seconds:.0f} rows/s "
+                    f"({load_seconds:.2f}s for {results['batches']} batches)")
+    
+    if 'commit_latency_seconds' in results:
+        # Batches commit one by one; a bulk load commits once
+        commits = 1 if bulk_load else results['batches']
+        commit_seconds = results['commit_latency_seconds'] * commits
+        index_seconds = sum(results.get(key, 0.0) for key in ('drop_seconds', 'rebuild_seconds', 'analyze_seconds'))
+        logger.info(f"  Commit latency: {results['commit_latency_seconds'] * 1000:.1f} ms measured "
+                    f"-> ~{commit_seconds:.2f}s for {commits} commits")
+        logger.info(f"  Projected import time: ~{load_seconds + index_seconds + commit_seconds:.2f}s")
+    
+    if 'wal_bytes' in results:
+        per_row = results['wal_bytes'] / results['success'] if results['success'] else 0
+        logger.info(f"  WAL generated: {results['wal_bytes'] / 1024 / 1024:.1f} MB ({per_row:.0f} bytes/row)")
+    
+    growth = {name: size for name, size in results.get('index_growth_bytes', {}).items() if size > 0}
+    if growth and not bulk_load:
+        logger.info(f"  Index growth: {sum(growth.values()) / 1024:.0f} kB across {len(growth)} indexes")
+        for name, size in sorted(growth.items(), key=lambda item: -item[1])[:5]:
+            logger.info(f"    {name}: {size / 1024:.0f} kB")
+    
+    if 'baseline_seconds' in results and load_seconds > 0:
+        overhead = max(load_seconds - results['baseline_seconds'], 0.0)
+        logger.info(f"  Index, foreign key and trigger overhead: ~{overhead:.2f}s "
+                    f"({overhead / load_seconds * 100:.0f}% of insert time; the same rows took "
+                    f"{results['baseline_seconds']:.2f}s in an unindexed copy of person)")
+
+def run_rehearsal(args, db_manager, rows, logger, file_results=None) -> int:
+    """Run the load in a transaction that is always rolled back and report on it"""
+    logger.info("Rehearsing the load - the transaction is rolled back at the end...")
+    results = db_manager.rehearse_load(rows, batch_size=args.batch_size, sizer=make_batch_sizer(args),
+                                       bulk_load=args.bulk_load)
+    
+    logger.info("\\n" + "="*70)
+    logger.info("REHEARSAL RESULTS (rolled back, no data was changed):")
+    log_rehearsal_report(results, args.bulk_load, logger)
+    if file_results:
+        logger.info("\\n" + format_file_report(file_results, results))
+    if results.get('batching'):
+        logger.info("\\n" + format_batching_report(results['batching']))
+    if args.bulk_load and 'deferred_indexes' in results:
+        log_bulk_load_report(results, logger)
+    if args.import_relationships:
+        logger.info("Relationships are not rehearsed: they need the persons to be committed")
+    
+    if results['errors']:
+        logger.warning("\\nRehearsal errors:")
+        for error in results['errors'][:10]:  # Show first 10 errors
+            logger.warning(f"  - {error}")
+        if len(results['errors']) > 10:
+            logger.warning(f"  ... and {len(results['errors']) - 10} more errors")
+    
+    logger.info("=== REHEARSAL COMPLETED ===" + "="*50)
+    
+    return 0 if results['failed'] == 0 and not results['errors'] else 1
+
+def run_pipelined_import(args, db_manager, processed_rows, import_batch_id: str, logger) -> int:
+    """Clean and insert concurrently, loading each batch as soon as it is cleaned"""
+    from pipeline import ImportPipeline
+    
+    if not args.force:
+        # Rows are loaded before the whole file is validated, so confirm up front
+        response = input("Pipelined import loads rows while the file is still being validated; "
+                         "invalid rows are skipped. Continue? (y/N): ")
+        if response.lower() != 'y':
+            logger.info("Import cancelled by user")
+            return 0
+    
+    logger.info(f"Importing with pipelined cleaning and loading as batch {import_batch_id}...")
+    pipeline = ImportPipeline(
+        db_manager,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        use_docker=args.use_docker,
+        bulk_load=args.bulk_load,
+        sizer=make_batch_sizer(args)
+    )
+    results = pipeline.run(processed_rows)
+    
+    final_stats = db_manager.get_stats(import_batch_id, use_docker=args.use_docker)
+    logger.info(f"Database stats after import: {final_stats}")
+    
+    logger.info("\\n" + "="*70)
+    logger.info("IMPORT RESULTS:")
+    logger.info(f"  Cleaned records: {results['processed']} ({results['duplicates']} duplicates skipped)")
+    logger.info(f"  Rejected rows: {len(results['processing_errors'])}")
+    log_import_counts(results, final_stats, import_batch_id, logger)
+    logger.info("\\n" + ImportPipeline.format_report(results))
+    if results.get('batching'):
+        logger.info("\\n" + format_batching_report(results['batching']))
+    if args.bulk_load:
+        log_bulk_load_report(results, logger)
+    
+    if args.import_relationships:
+        run_relationship_stage(ImportConfig(), db_manager, results['relationship_rows'], logger)
+    
+    for label, errors in (("Processing errors", results['processing_errors']), ("Import errors", results['errors'])):
+        if errors:
+            logger.warning(f"\\n{label}:")
+            for error in errors[:10]:  # Show first 10 errors
+                logger.warning(f"  - {error}")
+            if len(errors) > 10:
+                logger.warning(f"  ... and {len(errors) - 10} more errors")
+    
+    logger.info("=== IMPORT COMPLETED ===" + "="*50)
+    
+    if results['aborted']:
+        logger.error("Import stopped before the end of the file; see the import errors above")
+    return 0 if results['failed'] == 0 and not results['aborted'] and results['success'] > 0 else 1
+
+def run_multi_file_import(args, csv_paths, schema_rules: Optional[SchemaRules], db_manager,
+                          import_batch_id: Optional[str], logger, center_id: Optional[str] = None) -> int:
+    """Clean several files in parallel, deduplicate across them and load them all in one session"""
+    data_processor = make_data_processor(args, ImportConfig(), schema_rules, import_batch_id, center_id)
+    if args.preview_only:
+        for csv_path in csv_paths:
+            logger.info("\\n" + data_processor.generate_preview(data_processor.read_csv(csv_path)))
+        logger.info("Preview-only mode. Exiting.")
+        return 0
+    if args.pipeline:
+        logger.warning("--pipeline is ignored for multiple files; they are cleaned in parallel before loading")
+    
+    workers = max(1, min(args.parse_workers, len(csv_paths)))
+    logger.info(f"Cleaning {len(csv_paths)} files with {workers} worker processes...")
+    started = time.perf_counter()
+    file_results = process_files(csv_paths, schema_rules, import_batch_id,
+                                 None if args.no_cache else args.cache_dir, workers, engine=args.engine,
+                                 center_id=center_id)
+    parse_seconds = time.perf_counter() - started
+    
+    structure_failures = [result for result in file_results if result['structure_errors']]
+    for result in structure_failures:
+        logger.error(f"CSV validation failed for {result['path']}:")
+        for error in result['structure_errors']:
+            logger.error(f"  - {error}")
+    if structure_failures:
+        return 1
+    
+    processed_rows = merge_files(file_results, skip_duplicates=args.skip_duplicates)
+    processed_data, processing_errors = data_processor.collect_processed_rows(processed_rows)
+    logger.info("\\n" + data_processor.generate_summary(processed_data, processing_errors))
+    logger.info("\\n" + format_file_report(file_results))
+    logger.info(f"Cleaned {len(csv_paths)} files in {parse_seconds:.2f}s")
+    
+    if not processed_data:
+        logger.error("No valid data to import")
+        return 1
+    
+    if processing_errors:
+        logger.warning(f"Found {len(processing_errors)} processing errors")
+        if not args.force:
+            response = input("Continue with import? (y/N): ")
+            if response.lower() != 'y':
+                logger.info("Import cancelled by user")
+                return 0
+        else:
+            logger.info("Force flag set - proceeding with import despite errors")
+    
+    if args.dry_run:
+        logger.info("Dry run mode - not inserting data into database")
+        logger.info(f"Would have inserted {len(processed_data)} records from {len(csv_paths)} files")
+        return 0
+    
+    rows = ((row_label, record) for row_label, record, _ in processed_rows if record is not None)
+    if args.rehearse:
+        return run_rehearsal(args, db_manager, rows, logger, file_results=file_results)
+    
+    logger.info(f"Importing {len(processed_data)} records from {len(csv_paths)} files in one session "
+                f"as batch {import_batch_id}...")
+    if args.bulk_load:
+        import_results = db_manager.bulk_load_persons(rows, batch_size=args.batch_size, sizer=make_batch_sizer(args))
+    else:
+        import_results = db_manager.load_persons(rows, use_docker=args.use_docker, batch_size=args.batch_size,
+                                                 sizer=make_batch_sizer(args))
+    
+    final_stats = db_manager.get_stats(import_batch_id, use_docker=args.use_docker)
+    logger.info(f"Database stats after import: {final_stats}")
+    
+    logger.info("\\n" + "="*70)
+    logger.info("IMPORT RESULTS:")
+    log_import_counts(import_results, final_stats, import_batch_id, logger)
+    logger.info("\\n" + format_file_report(file_results, import_results))
+    if import_results.get('batching'):
+        logger.info("\\n" + format_batching_report(import_results['batching']))
+    if args.bulk_load:
+        log_bulk_load_report(import_results, logger)
+    
+    if args.import_relationships:
+        run_relationship_stage(ImportConfig(), db_manager, processed_rows, logger)
+    
+    if import_results['errors']:
+        logger.warning("\\nImport errors:")
+        for error in import_results['errors'][:10]:  # Show first 10 errors
+            logger.warning(f"  - {error}")
+        if len(import_results['errors']) > 10:
+            logger.warning(f"  ... and {len(import_results['errors']) - 10} more errors")
+    
+    logger.info("=== IMPORT COMPLETED ===" + "="*50)
+    
+    return 0 if import_results['failed'] == 0 and not import_results['aborted'] else 1
+
 def main():
     """Main execution function"""
     parser = argparse.ArgumentParser(description='Import persons from CSV to database')
-    parser.add_argument('csv_file', nargs='?', 
-                       default='Membership Byoma Kusuma.csv',
-                       help='Path to CSV file (default: Membership Byoma Kusuma.csv)')
+    parser.add_argument('csv_files', nargs='*', metavar='csv_file',
+                       default=['Membership Byoma Kusuma.csv'],
+                       help='CSV files or glob patterns; several files are deduplicated against each other '
+                            'and loaded in one session (default: Membership Byoma Kusuma.csv)')
     parser.add_argument('--dry-run', action='store_true',
                        help='Process data but do not insert into database')
     parser.add_argument('--use-docker', action='store_true',
@@ -73,6 +422,11 @@ def main():
                        help='Skip duplicate records (default: True)')
     parser.add_argument('--batch-size', type=int, default=100,
                        help='Batch size for database inserts (default: 100)')
+    parser.add_argument('--adaptive-batching', action='store_true',
+                       help='Grow or shrink batches toward --target-batch-seconds, starting from --batch-size '
+                            '(direct connection only; --use-docker inserts row by row)')
+    parser.add_argument('--target-batch-seconds', type=float, default=0.5,
+                       help='Target insert+commit latency per batch for adaptive batching (default: 0.5)')
     parser.add_argument('--preview-only', action='store_true',
                        help='Only show data preview, do not process')
     parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
@@ -80,23 +434,77 @@ def main():
     parser.add_argument('--log-file', help='Log file path (optional)')
     parser.add_argument('--force', action='store_true',
                        help='Skip confirmation prompts and proceed with import')
+    parser.add_argument('--pipeline', action='store_true',
+                       help='Overlap cleaning with database inserts instead of running them one after another; '
+                            'the CSV is read in chunks, so memory stays bounded whatever the file size')
+    parser.add_argument('--queue-size', type=int, default=4,
+                       help='Cleaned batches buffered between pipeline stages (default: 4)')
+    parser.add_argument('--bulk-load', action='store_true',
+                       help='Large initial loads: drop non-unique person indexes, load in one transaction, then rebuild them')
+    parser.add_argument('--schema-file', default=os.path.join('.import_cache', 'person_schema.json'),
+                       help='Local copy of the person table rules used for offline validation')
+    parser.add_argument('--refresh-schema', action='store_true',
+                       help='Read the person table rules from the database even in dry-run mode')
+    parser.add_argument('--center', default=ImportConfig.DEFAULT_CENTER,
+                       help='Name of an existing center imported persons are assigned to (default: none, '
+                            'center_id is left empty)')
+    parser.add_argument('--import-relationships', action='store_true',
+                       help='After importing, create person_relationship rows from the configured relationship columns')
+    parser.add_argument('--rehearse', action='store_true',
+                       help='Run the full load in a transaction that is always rolled back, reporting constraint '
+                            'failures, throughput, commit latency and index overhead')
+    parser.add_argument('--rollback', metavar='BATCH_ID',
+                       help='Delete every person created by the given import batch, then exit')
+    parser.add_argument('--engine', choices=['pandas', 'csv'], default='pandas',
+                       help='CSV engine: pandas, or csv to stream rows with the standard library without loading pandas')
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count() or 1,
+                       help='Files cleaned in parallel when importing several files (default: CPU count)')
+    parser.add_argument('--cache-dir', default='.import_cache',
+                       help='Directory for cached processing results (default: .import_cache)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always re-read and re-clean the CSV instead of using cached results')
     
     args = parser.parse_args()
+    csv_paths = expand_csv_paths(args.csv_files)
+    args.csv_file = csv_paths[0]
     
     # Setup logging
     setup_logging(args.log_level, args.log_file)
     logger = logging.getLogger(__name__)
     
     logger.info("=== PERSONS CSV IMPORT STARTED ===" + "="*50)
-    logger.info(f"CSV file: {args.csv_file}")
+    logger.info(f"CSV files: {', '.join(csv_paths)}")
     logger.info(f"Dry run: {args.dry_run}")
     logger.info(f"Use Docker: {args.use_docker}")
     logger.info(f"Skip duplicates: {args.skip_duplicates}")
+    logger.info(f"Engine: {args.engine}")
+    logger.info(f"Pipelined: {args.pipeline}")
+    logger.info(f"Bulk load: {args.bulk_load}")
+    logger.info(f"Rehearsal: {args.rehearse}")
+    
+    if args.bulk_load and args.use_docker:
+        logger.error("--bulk-load requires a direct database connection and cannot be used with --use-docker")
+        return 1
+    if args.rehearse and (args.use_docker or args.pipeline or args.dry_run):
+        logger.error("--rehearse requires a direct database connection and cannot be combined with "
+                     "--use-docker, --pipeline or --dry-run")
+        return 1
+    if args.import_relationships and args.use_docker:
+        logger.error("--import-relationships requires a direct database connection and cannot be used with --use-docker")
+        return 1
+    
+    if args.rollback:
+        try:
+            from database import DatabaseManager
+        except ImportError as e:
+            logger.error(f"Database module import failed: {e}")
+            return 1
+        return run_rollback(args, DatabaseManager(ImportConfig.DB_CONFIG), logger)
     
     try:
         # Validate environment
         logger.info("Validating environment...")
-        env_errors = validate_environment(preview_only=args.preview_only or args.dry_run, use_docker=args.use_docker)
+        env_errors = validate_environment(csv_paths, preview_only=args.preview_only or args.dry_run, use_docker=args.use_docker)
         if env_errors:
             logger.error("Environment validation failed:")
             for error in env_errors:
@@ -105,7 +513,8 @@ def main():
         
         # Initialize components
         config = ImportConfig()
-        data_processor = DataProcessor(config)
+        import_batch_id = None if args.dry_run or args.preview_only else str(uuid.uuid4())
+        data_processor = make_data_processor(args, config, import_batch_id=import_batch_id)
         
         # Initialize database manager only if needed
         db_manager = None
@@ -132,32 +541,70 @@ def main():
                     logger.info("Try using --use-docker flag")
                     return 1
                 logger.info("Direct database connection successful")
+            
+            data_processor.center_id = resolve_center(args, db_manager, logger)
         
-        # Read and validate CSV
-        logger.info("Reading CSV file...")
-        df = data_processor.read_csv(args.csv_file)
+        # Validate against the live table definition instead of hard-coded enums
+        if not args.preview_only:
+            data_processor.schema_rules = load_schema_rules(args, db_manager, logger)
         
-        logger.info("Validating CSV structure...")
-        is_valid, validation_errors = data_processor.validate_csv_structure(df)
-        if not is_valid:
-            logger.error("CSV validation failed:")
-            for error in validation_errors:
-                logger.error(f"  - {error}")
-            return 1
+        if len(csv_paths) > 1:
+            return run_multi_file_import(args, csv_paths, data_processor.schema_rules, db_manager,
+                                         import_batch_id, logger, center_id=data_processor.center_id)
         
-        # Generate preview
-        preview = data_processor.generate_preview(df)
+        # Reuse cleaned output from an earlier run on the same file and config
+        cache = None
+        cache_key = None
+        cached = None
+        if not args.no_cache:
+            cache = ProcessingCache(args.cache_dir)
+            cache_key = cache.key(
+                args.csv_file, config, data_processor,
+                skip_duplicates=args.skip_duplicates,
+                schema=data_processor.schema_rules.fingerprint() if data_processor.schema_rules else None
+            )
+            cached = cache.load(args.csv_file, cache_key)
+        
+        if cached:
+            logger.info("Using cached processing results - skipping CSV parsing")
+            preview = cached['preview']
+        else:
+            # Read and validate CSV; a pipelined import never holds the whole file
+            logger.info("Reading CSV file...")
+            df = data_processor.read_csv(args.csv_file, chunked=args.pipeline and not args.dry_run)
+            
+            logger.info("Validating CSV structure...")
+            is_valid, validation_errors = data_processor.validate_csv_structure(df)
+            if not is_valid:
+                logger.error("CSV validation failed:")
+                for error in validation_errors:
+                    logger.error(f"  - {error}")
+                return 1
+            
+            # Generate preview
+            preview = data_processor.generate_preview(df)
         logger.info("\\n" + preview)
         
         if args.preview_only:
             logger.info("Preview-only mode. Exiting.")
             return 0
         
+        if cached:
+            processed_rows = cache.iter_rows(cached, data_processor)
+        else:
+            processed_rows = data_processor.iter_processed_rows(df, skip_duplicates=args.skip_duplicates)
+            if cache:
+                # Written as rows stream past, so pipelined runs fill the cache too
+                processed_rows = cache.recording(args.csv_file, cache_key, preview, processed_rows)
+        
+        if args.pipeline and not args.dry_run:
+            return run_pipelined_import(args, db_manager, processed_rows, import_batch_id, logger)
+        
         # Process data
-        logger.info("Processing CSV data...")
-        processed_data, processing_errors = data_processor.process_csv_data(
-            df, skip_duplicates=args.skip_duplicates
-        )
+        if not cached:
+            logger.info(f"Processing {len(df)} CSV rows...")
+        processed_rows = list(processed_rows)
+        processed_data, processing_errors = data_processor.collect_processed_rows(processed_rows)
         
         # Generate summary
         summary = data_processor.generate_summary(processed_data, processing_errors)
@@ -182,31 +629,52 @@ def main():
             logger.info(f"Would have inserted {len(processed_data)} records")
             return 0
         
+        if args.rehearse:
+            return run_rehearsal(
+                args, db_manager,
+                ((row_number, record) for row_number, record, _ in processed_rows if record is not None),
+                logger
+            )
+        
         # Import data to database
         logger.info(f"Importing {len(processed_data)} records to database...")
         
-        # Get current stats
-        initial_stats = db_manager.get_stats()
-        logger.info(f"Database stats before import: {initial_stats}")
+        logger.info(f"Import batch: {import_batch_id}")
         
-        # Perform import
-        import_results = db_manager.batch_insert_persons(
-            processed_data, 
-            use_docker=args.use_docker,
-            batch_size=args.batch_size
+        # Perform import, keeping source row numbers for failure messages
+        rows_to_load = (
+            (row_number, person_data) for row_number, person_data, errors in processed_rows
+            if person_data is not None and not errors
         )
+        if args.bulk_load:
+            import_results = db_manager.bulk_load_persons(
+                rows_to_load,
+                batch_size=args.batch_size,
+                sizer=make_batch_sizer(args)
+            )
+        else:
+            import_results = db_manager.load_persons(
+                rows_to_load,
+                use_docker=args.use_docker,
+                batch_size=args.batch_size,
+                sizer=make_batch_sizer(args)
+            )
         
         # Get final stats
-        final_stats = db_manager.get_stats()
+        final_stats = db_manager.get_stats(import_batch_id, use_docker=args.use_docker)
         logger.info(f"Database stats after import: {final_stats}")
         
         # Report results
         logger.info("\\n" + "="*70)
         logger.info("IMPORT RESULTS:")
-        logger.info(f"  Successfully imported: {import_results['success']} records")
-        logger.info(f"  Failed imports: {import_results['failed']} records")
-        logger.info(f"  Total persons in database: {final_stats['total_persons']}")
-        logger.info(f"  Imported by script: {final_stats['imported_persons']}")
+        log_import_counts(import_results, final_stats, import_batch_id, logger)
+        if import_results.get('batching'):
+            logger.info("\\n" + format_batching_report(import_results['batching']))
+        if args.bulk_load:
+            log_bulk_load_report(import_results, logger)
+        
+        if args.import_relationships:
+            run_relationship_stage(config, db_manager, processed_rows, logger)
         
         if import_results['errors']:
             logger.warning("\\nImport errors:")
@@ -217,7 +685,7 @@ def main():
         
         logger.info("=== IMPORT COMPLETED ===" + "="*50)
         
-        return 0 if import_results['failed'] == 0 else 1
+        return 0 if import_results['failed'] == 0 and not import_results['aborted'] else 1
         
     except KeyboardInterrupt:
         logger.info("\\nImport cancelled by user")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Script for importing registration form exports from CSV to the registration table
+Checks duplicates in bulk and loads new rows with a single COPY
+"""
+import argparse
+import logging
+import os
+import sys
+import uuid
+
+from config import RegistrationConfig
+from registrations import RegistrationProcessor
+from import_persons import setup_logging, load_schema_rules
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description='Import registration form responses from CSV to database')
+    parser.add_argument('csv_file', help='Path to the form export CSV file')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Process data but do not insert into database')
+    parser.add_argument('--preview-only', action='store_true',
+                       help='Only show data preview, do not process')
+    parser.add_argument('--imported-by', default=RegistrationConfig.DEFAULT_VALUES['imported_by'],
+                       help='Value stored in imported_by (default: csv_import_script)')
+    parser.add_argument('--force', action='store_true',
+                       help='Skip confirmation prompts')
+    parser.add_argument('--schema-file', default=os.path.join('.import_cache', 'registration_schema.json'),
+                       help='Local copy of the registration table rules used for offline validation')
+    parser.add_argument('--refresh-schema', action='store_true',
+                       help='Read the registration table rules from the database even in dry-run mode')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                       default='INFO', help='Logging level')
+    parser.add_argument('--log-file', help='Log file path (optional)')
+    # The duplicate check and COPY need a direct connection
+    parser.set_defaults(use_docker=False)
+
+    args = parser.parse_args()
+
+    setup_logging(args.log_level, args.log_file)
+    logger = logging.getLogger(__name__)
+
+    logger.info("=== REGISTRATIONS CSV IMPORT STARTED ===" + "="*50)
+    logger.info(f"CSV file: {args.csv_file}")
+    logger.info(f"Dry run: {args.dry_run}")
+
+    try:
+        if not os.path.exists(args.csv_file):
+            logger.error(f"CSV file not found: {args.csv_file}")
+            return 1
+
+        config = RegistrationConfig()
+        import_batch_id = None if args.dry_run or args.preview_only else str(uuid.uuid4())
+        processor = RegistrationProcessor(config, import_batch_id=import_batch_id, imported_by=args.imported_by)
+
+        db_manager = None
+        if not args.dry_run and not args.preview_only:
+            try:
+                from database import DatabaseManager
+                db_manager = DatabaseManager(config.DB_CONFIG)
+            except ImportError as e:
+                logger.error(f"Database module import failed: {e}")
+                logger.error("Install psycopg2-binary for database functionality: pip install psycopg2-binary")
+                return 1
+
+            logger.info("Testing database connection...")
+            if not db_manager.test_connection():
+                logger.error("Direct database connection failed")
+                return 1
+            logger.info("Direct database connection successful")
+
+        if not args.preview_only:
+            processor.schema_rules = load_schema_rules(args, db_manager, logger, table=config.TABLE)
+
+        logger.info("Reading CSV file...")
+        df = processor.read_csv(args.csv_file)
+
+        logger.info("Validating CSV structure...")
+        is_valid, validation_errors = processor.validate_csv_structure(df)
+        if not is_valid:
+            logger.error("CSV validation failed:")
+            for error in validation_errors:
+                logger.error(f"  - {error}")
+            return 1
+
+        logger.info("\\n" + processor.generate_preview(df))
+        if args.preview_only:
+            logger.info("Preview-only mode. Exiting.")
+            return 0
+
+        logger.info(f"Processing {len(df)} CSV rows...")
+        processed_rows = list(processor.iter_processed_rows(df))
+        processed_data, processing_errors = processor.collect_processed_rows(processed_rows)
+        logger.info("\\n" + processor.generate_summary(processed_data, processing_errors))
+
+        if not processed_data:
+            logger.error("No valid data to import")
+            return 1
+
+        if processing_errors:
+            logger.warning(f"Found {len(processing_errors)} processing errors")
+            if not args.force:
+                response = input("Continue with import? (y/N): ")
+                if response.lower() != 'y':
+                    logger.info("Import cancelled by user")
+                    return 0
+            else:
+                logger.info("Force flag set - proceeding with import despite errors")
+
+        if args.dry_run:
+            logger.info("Dry run mode - not inserting data into database")
+            logger.info(f"Would have checked and copied {len(processed_data)} registrations")
+            return 0
+
+        logger.info(f"Importing {len(processed_data)} registrations as batch {import_batch_id}...")
+        results = db_manager.load_registrations(
+            [(row_number, record) for row_number, record, _ in processed_rows if record is not None],
+            config.COPY_COLUMNS,
+            processor.duplicate_key
+        )
+
+        logger.info("\\n" + "="*70)
+        logger.info("IMPORT RESULTS:")
+        logger.info(f"  Already registered (skipped): {results['skipped_existing']}")
+        logger.info(f"  Successfully imported: {results['success']} registrations")
+        logger.info(f"  Failed imports: {results['failed']} registrations")
+        logger.info(f"  Duplicate check: {results['check_seconds']:.3f}s")
+        if results['success']:
+            rate = results['success'] / results['load_seconds'] if results['load_seconds'] > 0 else 0
+            logger.info(f"  COPY: {results['load_seconds']:.3f}s ({rate:.0f} rows/s)")
+        logger.info(f"  Import batch: {import_batch_id}")
+
+        for error in results['errors']:
+            logger.warning(f"  - {error}")
+
+        logger.info("=== IMPORT COMPLETED ===" + "="*50)
+        return 0 if results['failed'] == 0 else 1
+
+    except KeyboardInterrupt:
+        logger.info("\\nImport cancelled by user")
+        return 1
+    except Exception as e:
+        logger.error(f"Import failed with error: {e}")
+        logger.exception("Full error details:")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Multi-file import module
+Cleans several CSV exports in parallel and deduplicates them through one shared key index
+"""
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+from cache import ProcessingCache
+from config import ImportConfig
+from data_processor import DataProcessor
+from schema import SchemaRules
+from streaming import StreamingDataProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def expand_csv_paths(patterns: Iterable[str]) -> List[str]:
+    """Expand glob patterns (quoted, or from shells that don't expand them), dropping repeats.
+
+    A pattern matching nothing is kept as given, so the missing file is reported later.
+    """
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else []
+        for path in matches or [pattern]:
+            # "a/x.csv" and "./a/x.csv" are the same file
+            absolute = os.path.abspath(path)
+            if absolute not in seen:
+                seen.add(absolute)
+                paths.append(path)
+    return paths
+
+
+def display_names(csv_paths: List[str]) -> List[str]:
+    """Short unique names for files: paths relative to their common directory.
+
+    Same-named exports from different directories (a/members.csv, b/members.csv)
+    keep the directory that tells them apart.
+    """
+    absolute = [os.path.abspath(path) for path in csv_paths]
+    if not absolute:
+        return []
+    try:
+        base = os.path.commonpath([os.path.dirname(path) for path in absolute])
+    except ValueError:
+        # Paths on different drives have no common directory
+        return absolute
+    names = [os.path.relpath(path, base) for path in absolute]
+    return names if len(set(names)) == len(names) else absolute
+
+
+def process_file(csv_path: str, schema: Optional[Dict[str, Any]], import_batch_id: Optional[str],
+                 cache_dir: Optional[str], engine: str = 'pandas', center_id: Optional[str] = None) -> Dict[str, Any]:
+    """Read, check and clean one file; runs in a worker process.
+
+    Duplicates are not skipped here: the caller deduplicates all files through one
+    SharedKeyIndex so that repeats across files are caught too.
+    """
+    started = time.perf_counter()
+    config = ImportConfig()
+    # Compiled CHECK predicates can't be pickled, so the rules travel as their schema
+    processor_class = StreamingDataProcessor if engine == 'csv' else DataProcessor
+    processor = processor_class(config, SchemaRules(schema) if schema else None, import_batch_id, center_id)
+    result = {'path': csv_path, 'preview': '', 'rows': [], 'structure_errors': [], 'cached': False}
+
+    cache = ProcessingCache(cache_dir) if cache_dir else None
+    cached = None
+    if cache:
+        cache_key = cache.key(csv_path, config, processor, skip_duplicates=False,
+                              schema=processor.schema_rules.fingerprint() if processor.schema_rules else None)
+        cached = cache.load(csv_path, cache_key)
+
+    if cached:
+        result['preview'] = cached['preview']
+        result['rows'] = list(cache.iter_rows(cached, processor))
+        result['cached'] = True
+    else:
+        df = processor.read_csv(csv_path)
+        is_valid, validation_errors = processor.validate_csv_structure(df)
+        if not is_valid:
+            result['structure_errors'] = validation_errors
+            return result
+        result['preview'] = processor.generate_preview(df)
+        rows = processor.iter_processed_rows(df, skip_duplicates=False)
+        if cache:
+            rows = cache.recording(csv_path, cache_key, result['preview'], rows)
+        result['rows'] = list(rows)
+
+    result['parse_seconds'] = time.perf_counter() - started
+    return result
+
+
+def process_files(csv_paths: List[str], schema_rules: Optional[SchemaRules], import_batch_id: Optional[str],
+                  cache_dir: Optional[str], workers: int, engine: str = 'pandas',
+                  center_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Clean every file, `workers` files at a time, returning results in argument order"""
+    schema = schema_rules.schema if schema_rules else None
+    if workers <= 1 or len(csv_paths) == 1:
+        return [process_file(path, schema, import_batch_id, cache_dir, engine, center_id) for path in csv_paths]
+
+    # Processes rather than threads: cleaning is pure Python and would serialize on the GIL
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_file, path, schema, import_batch_id, cache_dir, engine, center_id)
+                   for path in csv_paths]
+        return [future.result() for future in futures]
+
+
+class SharedKeyIndex:
+    """Duplicate keys of every row kept so far across all files of one import"""
+
+    def __init__(self, duplicate_key: Callable[[Dict[str, Any]], Tuple[Any, ...]] = DataProcessor.duplicate_key):
+        self.duplicate_key = duplicate_key
+        self.first_seen: Dict[Tuple[Any, ...], str] = {}
+
+    def add(self, record: Dict[str, Any], csv_path: str) -> Optional[str]:
+        """Register a record; returns the file that already had it, or None if it is new"""
+        key = self.duplicate_key(record)
+        if key in self.first_seen:
+            return self.first_seen[key]
+        self.first_seen[key] = csv_path
+        return None
+
+
+def merge_files(file_results: List[Dict[str, Any]], skip_duplicates: bool = True,
+                key_index: SharedKeyIndex = None) -> List[Tuple[str, Optional[Dict[str, Any]], List[str]]]:
+    """Combine per-file rows into one processed-row stream, first occurrence winning.
+
+    Row numbers become "file.csv:N" labels (with the directory when file names
+    repeat) so errors point at the right file. Each file result gets its 'name' and
+    a 'counts' dict for the per-file report.
+    """
+    key_index = key_index or SharedKeyIndex()
+    merged = []
+    names = dict(zip((result['path'] for result in file_results),
+                     display_names([result['path'] for result in file_results])))
+
+    for file_result in file_results:
+        name = names[file_result['path']]
+        file_result['name'] = name
+        counts = {'rows': len(file_result['rows']), 'cleaned': 0, 'rejected': 0,
+                  'duplicates_in_file': 0, 'duplicates_across_files': 0}
+        file_result['counts'] = counts
+
+        for row_number, cleaned_data, errors in file_result['rows']:
+            label = f"{name}:{row_number}"
+            if errors:
+                counts['rejected'] += 1
+                merged.append((label, None, [error.replace(f"Row {row_number}:", f"Row {label}:", 1) for error in errors]))
+                continue
+            if cleaned_data is None:
+                counts['duplicates_in_file'] += 1
+                merged.append((label, None, []))
+                continue
+            if skip_duplicates:
+                seen_in = key_index.add(cleaned_data, file_result['path'])
+                if seen_in is not None:
+                    counts['duplicates_in_file' if seen_in == file_result['path'] else 'duplicates_across_files'] += 1
+                    if seen_in != file_result['path']:
+                        logger.warning(f"Row {label}: Duplicate of a person in {names[seen_in]}, skipping")
+                    merged.append((label, None, []))
+                    continue
+            counts['cleaned'] += 1
+            merged.append((label, cleaned_data, []))
+
+    return merged
+
+
+def format_file_report(file_results: List[Dict[str, Any]], load_results: Dict[str, Any] = None) -> str:
+    """Per-file table plus combined totals; load columns only when rows were loaded"""
+    columns = ['rows', 'cleaned', 'rejected', 'duplicates_in_file', 'duplicates_across_files']
+    headers = ['Rows', 'Cleaned', 'Rejected', 'Dup (file)', 'Dup (other files)']
+    names = [result.get('name') or name for result, name in
+             zip(file_results, display_names([result['path'] for result in file_results]))]
+    # Failed row labels are "<name>:N" with names unique per file, so they map to one file index
+    file_index = {name: index for index, name in enumerate(names)}
+    failed_by_file: Dict[int, int] = {}
+    if load_results is not None:
+        headers += ['Loaded', 'Failed']
+        for row_label in load_results.get('failed_rows', []):
+            index = file_index.get(str(row_label).rsplit(':', 1)[0])
+            if index is not None:
+                failed_by_file[index] = failed_by_file.get(index, 0) + 1
+
+    name_width = max([len(name) for name in names] + [len('TOTAL')])
+    lines = ["=== PER-FILE RESULTS ===",
+             "  ".join([f"{'File':<{name_width}}"] + [f"{header:>{max(len(header), 7)}}" for header in headers])]
+    totals = {column: 0 for column in columns + ['loaded', 'failed']}
+
+    for index, (result, name) in enumerate(zip(file_results, names)):
+        counts = dict(result.get('counts') or {column: 0 for column in columns})
+        if load_results is not None:
+            if load_results['success'] == 0 and load_results['failed']:
+                # The load was rolled back as a whole
+                counts['failed'] = counts['cleaned']
+            else:
+                counts['failed'] = failed_by_file.get(index, 0)
+            counts['loaded'] = counts['cleaned'] - counts['failed']
+        for column in totals:
+            totals[column] += counts.get(column, 0)
+        values = [counts[column] for column in columns]
+        if load_results is not None:
+            values += [counts['loaded'], counts['failed']]
+        suffix = " (structure errors)" if result['structure_errors'] else " (cached)" if result['cached'] else ""
+        lines.append("  ".join([f"{name:<{name_width}}"] +
+                               [f"{value:>{max(len(header), 7)}}" for header, value in zip(headers, values)]) + suffix)
+
+    values = [totals[column] for column in columns]
+    if load_results is not None:
+        values += [totals['loaded'], totals['failed']]
+    lines.append("  ".join([f"{'TOTAL':<{name_width}}"] +
+                           [f"{value:>{max(len(header), 7)}}" for header, value in zip(headers, values)]))
+    return "\n".join(lines)
@@ -0,0 +1,133 @@
+"""
+Registration processing module
+Cleans registration form exports with the person import pipeline
+"""
+import logging
+from typing import TYPE_CHECKING, Dict, List, Any, Iterable, Tuple
+
+from config import RegistrationConfig, is_missing
+from data_processor import DataProcessor
+from schema import SchemaRules
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class RegistrationProcessor(DataProcessor):
+    """DataProcessor for the `registration` table.
+
+    Every form row is also kept verbatim in `raw_data`, and duplicates are
+    detected with the same normalization as idx_registration_dupe_key.
+    """
+
+    def __init__(self, config: RegistrationConfig = None, schema_rules: SchemaRules = None,
+                 import_batch_id: str = None, imported_by: str = None):
+        super().__init__(config or RegistrationConfig(), schema_rules, import_batch_id)
+        self.imported_by = imported_by
+        self._column_fields: Dict[Tuple[str, ...], List[Tuple[str, str]]] = {}
+
+    def column_fields(self, columns: Iterable[str]) -> List[Tuple[str, str]]:
+        """(CSV column, registration column) pairs for a header row"""
+        columns = tuple(columns)
+        if columns not in self._column_fields:
+            pairs = []
+            for column in columns:
+                field = self.config.COLUMN_MAPPINGS.get(column)
+                if field is None:
+                    normalized = " ".join(column.lower().split())
+                    for keyword_field, phrases in self.config.COLUMN_KEYWORDS.items():
+                        if all(phrase in normalized for phrase in phrases):
+                            field = keyword_field
+                            break
+                if field is not None:
+                    pairs.append((column, field))
+            self._column_fields[columns] = pairs
+        return self._column_fields[columns]
+
+    def validate_csv_structure(self, df: 'pd.DataFrame') -> Tuple[bool, List[str]]:
+        """Check the export has name columns; unmapped columns are only kept in raw_data"""
+        errors = []
+        pairs = self.column_fields(df.columns)
+        mapped_fields = {field for _, field in pairs}
+
+        missing_fields = [field for field in self.config.REQUIRED_FIELDS if field not in mapped_fields]
+        if missing_fields:
+            errors.append(f"No column found for required fields: {missing_fields}")
+
+        unmapped = set(df.columns) - {column for column, _ in pairs}
+        if unmapped:
+            logger.warning(f"Columns only kept in raw_data: {unmapped}")
+
+        errors.extend(self.check_target_fields())
+
+        return len(errors) == 0, errors
+
+    def target_fields(self) -> List[str]:
+        """Every record is written through COPY with exactly these columns"""
+        return list(self.config.COPY_COLUMNS)
+
+    def clean_row_data(self, row: 'pd.Series') -> Dict[str, Any]:
+        """Clean one form row into a registration record"""
+        cleaned_data = {}
+
+        for csv_column, db_field in self.column_fields(row.index):
+            if cleaned_data.get(db_field) is not None:
+                continue
+            raw_value = row[csv_column]
+            if db_field in self.config.FIELD_CLEANERS:
+                cleaned_value = self.config.FIELD_CLEANERS[db_field](raw_value)
+            else:
+                cleaned_value = self._clean_string_value(raw_value)
+            if cleaned_value is not None:
+                cleaned_data[db_field] = cleaned_value
+
+        # The form asks for first and middle names in one field
+        first_and_middle = cleaned_data.pop('first_name', None)
+        if first_and_middle:
+            first_name, *middle_names = first_and_middle.split()
+            cleaned_data['first_name'] = first_name
+            if middle_names:
+                cleaned_data['middle_name'] = " ".join(middle_names)
+
+        cleaned_data['raw_data'] = {
+            str(column): None if is_missing(value) else value
+            for column, value in row.items()
+        }
+
+        for field, default_value in self.config.DEFAULT_VALUES.items():
+            if field not in cleaned_data:
+                cleaned_data[field] = default_value
+        if self.imported_by:
+            cleaned_data['imported_by'] = self.imported_by
+
+        return self.stamp_record(cleaned_data)
+
+    @staticmethod
+    def duplicate_key(row_data: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Key matching idx_registration_dupe_key.
+
+        The index is (src_timestamp, LOWER(TRIM(first_name)), LOWER(TRIM(last_name)),
+        COALESCE(TRIM(phone), ''), COALESCE(LOWER(TRIM(email)), '')). TRIM only strips
+        spaces, so strip(' ') is used rather than strip().
+        """
+        def text(field: str) -> str:
+            return (row_data.get(field) or '').strip(' ')
+
+        return (
+            row_data.get('src_timestamp'),
+            text('first_name').lower(),
+            text('last_name').lower(),
+            text('phone'),
+            text('email').lower()
+        )
+
+    def generate_preview(self, df: 'pd.DataFrame', num_rows: int = 5) -> str:
+        """Preview with keyword-matched question columns shown as mapped"""
+        mapped = dict(self.column_fields(df.columns))
+        preview = super().generate_preview(df, num_rows)
+        for column, field in mapped.items():
+            if column not in self.config.COLUMN_MAPPINGS:
+                preview = preview.replace(f". {column} -> NOT MAPPED", f". {column} -> {field}", 1)
+        return preview
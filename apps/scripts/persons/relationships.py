@@ -0,0 +1,127 @@
+"""
+Relationship resolution module
+Matches relationship references from the CSV against an in-memory person index
+"""
+import logging
+import re
+from typing import Dict, List, Optional, Any, Iterable, Set, Tuple
+
+from config import ImportConfig
+from data_processor import RELATIONSHIPS_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class PersonIndex:
+    """Lookup of person ids by normalized full name, email and phone number.
+
+    Built once from a single query, so resolving references never goes back to
+    the database.
+    """
+
+    def __init__(self):
+        self.by_name: Dict[str, Set[str]] = {}
+        self.by_email: Dict[str, Set[str]] = {}
+        self.by_phone: Dict[str, Set[str]] = {}
+        self.ids: Set[str] = set()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[Any, ...]]) -> 'PersonIndex':
+        """Build from (id, firstName, middleName, lastName, emailId, phone...) rows"""
+        index = cls()
+        for person_id, first_name, middle_name, last_name, email, *phones in rows:
+            index.add(person_id, first_name, middle_name, last_name, email, phones)
+        return index
+
+    @staticmethod
+    def normalize_name(*parts: Optional[str]) -> str:
+        return " ".join(" ".join(part for part in parts if part).split()).casefold()
+
+    @staticmethod
+    def normalize_phone(phone: Optional[str]) -> str:
+        digits = re.sub(r'\D', '', phone or '')
+        # Compare on the last 10 digits so country prefixes don't matter
+        return digits[-10:]
+
+    def add(self, person_id: str, first_name: str, middle_name: Optional[str], last_name: str,
+            email: Optional[str], phones: Iterable[Optional[str]]):
+        person_id = str(person_id)
+        self.ids.add(person_id)
+        self.by_name.setdefault(self.normalize_name(first_name, last_name), set()).add(person_id)
+        if middle_name:
+            self.by_name.setdefault(self.normalize_name(first_name, middle_name, last_name), set()).add(person_id)
+        if email:
+            self.by_email.setdefault(email.strip().lower(), set()).add(person_id)
+        for phone in phones:
+            normalized = self.normalize_phone(phone)
+            if len(normalized) >= 7:
+                self.by_phone.setdefault(normalized, set()).add(person_id)
+
+    def lookup(self, reference: str) -> Set[str]:
+        """Ids matching a free-text reference (email, phone number or full name)"""
+        reference = reference.strip()
+        if '@' in reference:
+            return self.by_email.get(reference.lower(), set())
+        if re.fullmatch(r'[\d\s+().-]+', reference):
+            return self.by_phone.get(self.normalize_phone(reference), set())
+        return self.by_name.get(self.normalize_name(reference), set())
+
+
+class RelationshipResolver:
+    """Turns relationship references on imported records into person_relationship rows"""
+
+    def __init__(self, person_index: PersonIndex, config: ImportConfig = None):
+        self.person_index = person_index
+        self.config = config or ImportConfig()
+
+    @staticmethod
+    def collect_references(processed_rows: Iterable[Tuple[Optional[int], Optional[Dict[str, Any]], List[str]]]) -> List[Tuple[Optional[int], str, str, str]]:
+        """(row_number, person_id, relationship_type, reference) for every reference on a record"""
+        references = []
+        for row_number, cleaned_data, _ in processed_rows:
+            if cleaned_data is None:
+                continue
+            for relationship_type, reference in cleaned_data.get(RELATIONSHIPS_KEY, []):
+                references.append((row_number, cleaned_data['id'], relationship_type, reference))
+        return references
+
+    def resolve(self, references: Iterable[Tuple[Optional[int], str, str, str]]) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+        """Resolve references in memory.
+
+        Returns (person_id, related_person_id, relationship_type) rows in both
+        directions, and reject messages for references that match no one, match
+        several people, or contradict an earlier reference for the same pair.
+        """
+        relationships: Dict[Tuple[str, str], str] = {}
+        rejects = []
+
+        for row_number, person_id, relationship_type, reference in references:
+            prefix = f"Row {row_number}: " if row_number is not None else ""
+            reciprocal_type = self.config.RELATIONSHIP_RECIPROCALS.get(relationship_type)
+            if reciprocal_type is None:
+                rejects.append(f"{prefix}Unknown relationship type '{relationship_type}' for '{reference}'")
+                continue
+            if person_id not in self.person_index.ids:
+                rejects.append(f"{prefix}Person was not imported, skipping {relationship_type} '{reference}'")
+                continue
+
+            matches = self.person_index.lookup(reference) - {person_id}
+            if not matches:
+                rejects.append(f"{prefix}No person found for {relationship_type} '{reference}'")
+                continue
+            if len(matches) > 1:
+                rejects.append(f"{prefix}Ambiguous {relationship_type} '{reference}' matches {len(matches)} persons")
+                continue
+
+            related_id = matches.pop()
+            existing_type = relationships.get((person_id, related_id))
+            if existing_type is not None and existing_type != relationship_type:
+                rejects.append(f"{prefix}{relationship_type} '{reference}' conflicts with an earlier {existing_type} reference")
+                continue
+            # Store the reciprocal too, like the server does
+            relationships[(person_id, related_id)] = relationship_type
+            relationships[(related_id, person_id)] = reciprocal_type
+
+        rows = [(person_id, related_id, relationship_type)
+                for (person_id, related_id), relationship_type in relationships.items()]
+        return rows, rejects
@@ -0,0 +1,211 @@
+"""
+Schema rules module
+Validation rules introspected from the live database table definition
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Any, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# One round trip returning the whole table definition as JSON, so the same
+# query works over a direct connection and through `docker exec psql`
+TABLE_SCHEMA_QUERY = """
+SELECT json_build_object(
+    'table', c.relname,
+    'columns', (
+        SELECT json_agg(json_build_object(
+            'name', a.attname,
+            'type', format_type(a.atttypid, a.atttypmod),
+            'max_length', CASE
+                WHEN t.typname IN ('varchar', 'bpchar') AND a.atttypmod > 4 THEN a.atttypmod - 4
+            END,
+            'not_null', a.attnotnull,
+            'has_default', a.atthasdef,
+            'enum_values', (
+                SELECT json_agg(e.enumlabel ORDER BY e.enumsortorder)
+                FROM pg_enum e
+                WHERE e.enumtypid = a.atttypid
+            )
+        ) ORDER BY a.attnum)
+        FROM pg_attribute a
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    ),
+    'checks', (
+        SELECT json_agg(json_build_object(
+            'name', con.conname,
+            'definition', pg_get_constraintdef(con.oid)
+        ) ORDER BY con.conname)
+        FROM pg_constraint con
+        WHERE con.conrelid = c.oid AND con.contype = 'c'
+    )
+)
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public' AND c.relname = %s
+"""
+
+_INT_RANGES = {
+    'smallint': (-32768, 32767),
+    'integer': (-2147483648, 2147483647),
+    'bigint': (-9223372036854775808, 9223372036854775807)
+}
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '!=': lambda a, b: a != b
+}
+
+# "col" IS NULL OR <rest on the same col>: NULLs already pass, so only <rest> matters
+_NULL_OR = re.compile(r'^\(\(+"?(?P<col>\w+)"?\)*\s+IS\s+NULL\)\s+OR\s+(?P<rest>.*)\)$', re.S)
+# ("col" > 1900), (("col")::text = 'x')
+_COMPARISON = re.compile(
+    r'^\(*"?(?P<col>\w+)"?\)*(?:::[\w ]+)?\s*(?P<op>>=|<=|<>|!=|=|>|<)\s*'
+    r"\(*(?:(?P<num>-?\d+(?:\.\d+)?)|'(?P<str>[^']*)'(?:::[\w ]+)?)\)*$",
+    re.S
+)
+# (("col")::text = ANY ((ARRAY['BS'::character varying, 'AD'::character varying])::text[]))
+_ANY = re.compile(r'^\(*"?(?P<col>\w+)"?\)*(?:::[\w ]+)?\s*=\s*ANY\s*\(+ARRAY\[(?P<values>.*)\]', re.S)
+
+
+class SchemaRules:
+    """Column types, lengths, NOT NULL, enum and simple CHECK rules for one table.
+
+    CHECK constraints are compiled when they compare a single column against a
+    constant or a list of constants; anything more complex is left to the database.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self.table = schema['table']
+        self.columns = {column['name']: column for column in schema.get('columns') or []}
+        self.checks = []
+        for check in schema.get('checks') or []:
+            compiled = self._compile_check(check['definition'])
+            if compiled:
+                self.checks.append((check['name'], *compiled))
+            else:
+                logger.debug(f"CHECK {check['name']} is not evaluated client-side: {check['definition']}")
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SchemaRules']:
+        """Read rules cached by `save`, or None if there is no cache file"""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        """Cache the rules locally so later dry runs work offline"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.schema, f, indent=2, sort_keys=True)
+
+    def unknown_columns(self, fields: Iterable[str]) -> List[str]:
+        """Fields that are not columns of the table"""
+        return [field for field in fields if field not in self.columns]
+
+    def fingerprint(self) -> str:
+        """Stable hash of the rules, used in processing cache keys"""
+        return hashlib.sha256(json.dumps(self.schema, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def _compile_check(definition: str):
+        """Turn a CHECK definition into (column, predicate), or None if unsupported"""
+        expression = re.sub(r'^CHECK\s*', '', definition.strip())
+        expression = re.sub(r'\s+NOT VALID$', '', expression)
+
+        match = _NULL_OR.match(expression)
+        if match:
+            compiled = SchemaRules._compile_condition(match.group('rest'))
+            # "a IS NULL OR <cond on b>" is a two-column rule, not a rule on b
+            if compiled and compiled[0] != match.group('col'):
+                return None
+            return compiled
+
+        return SchemaRules._compile_condition(expression)
+
+    @staticmethod
+    def _compile_condition(expression: str):
+        """(column, predicate) for a single-column comparison or ANY list, or None"""
+        match = _ANY.match(expression)
+        if match:
+            allowed = re.findall(r"'([^']*)'", match.group('values'))
+            return match.group('col'), lambda value: str(value) in allowed
+
+        match = _COMPARISON.match(expression)
+        if match:
+            compare = _OPERATORS[match.group('op')]
+            if match.group('num') is not None:
+                number = float(match.group('num'))
+
+                def predicate(value):
+                    try:
+                        return compare(float(value), number)
+                    except (TypeError, ValueError):
+                        return False
+                return match.group('col'), predicate
+            text = match.group('str')
+            return match.group('col'), lambda value: compare(str(value), text)
+
+        return None
+
+    def validate(self, row_data: Dict[str, Any], row_index: int, reported_missing: Iterable[str] = ()) -> List[str]:
+        """Check one cleaned record against the table definition.
+
+        Columns in `reported_missing` were already flagged by the caller and are not
+        reported again as NOT NULL violations.
+        """
+        errors = []
+
+        for field, value in row_data.items():
+            if field.startswith('_'):
+                # Processing metadata, never inserted
+                continue
+            column = self.columns.get(field)
+            if column is None:
+                errors.append(f"Row {row_index}: Column '{field}' does not exist in table {self.table}")
+                continue
+            if value is None:
+                continue
+
+            enum_values = column.get('enum_values')
+            if enum_values and value not in enum_values:
+                errors.append(f"Row {row_index}: Invalid {field} value '{value}'. Must be one of: {enum_values}")
+
+            max_length = column.get('max_length')
+            if max_length and isinstance(value, str) and len(value) > max_length:
+                errors.append(f"Row {row_index}: {field} is {len(value)} characters, longer than the {max_length} allowed")
+
+            int_range = _INT_RANGES.get(column.get('type'))
+            if int_range:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    errors.append(f"Row {row_index}: {field} must be an integer, got '{value}'")
+                elif not int_range[0] <= value <= int_range[1]:
+                    errors.append(f"Row {row_index}: {field} value {value} is out of range")
+            elif column.get('type') == 'boolean' and not isinstance(value, bool):
+                errors.append(f"Row {row_index}: {field} must be a boolean, got '{value}'")
+
+        for name, column in self.columns.items():
+            if name in reported_missing:
+                continue
+            if column.get('not_null') and not column.get('has_default') and row_data.get(name) is None:
+                errors.append(f"Row {row_index}: Missing value for NOT NULL column '{name}'")
+
+        for name, field, predicate in self.checks:
+            value = row_data.get(field)
+            if value is not None and not predicate(value):
+                errors.append(f"Row {row_index}: {field} value '{value}' violates constraint {name}")
+
+        return errors
@@ -0,0 +1,104 @@
+"""
+Streaming CSV engine
+Reads CSV files with the stdlib csv module, one row at a time, so imports run without pandas
+"""
+import csv
+import logging
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from data_processor import DataProcessor, CSV_ENCODINGS
+
+logger = logging.getLogger(__name__)
+
+# Cells pandas.read_csv reads as missing by default
+PANDAS_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+])
+
+
+class CsvSource:
+    """A CSV file read lazily into row dicts shaped like `pandas.read_csv(dtype=str)` rows.
+
+    Missing cells are None, blank header cells become "Unnamed: <position>" and
+    repeated headers get ".1", ".2" suffixes, as pandas names them. Opening the file
+    makes one streaming pass to pick the encoding and count rows, so nothing but
+    the current row is ever held in memory.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self.encoding, self.columns, self.row_count = self._scan()
+
+    def _scan(self) -> Tuple[str, List[str], int]:
+        for encoding in CSV_ENCODINGS:
+            # utf-8-sig also reads plain UTF-8, and drops a BOM like pandas does
+            encoding = 'utf-8-sig' if encoding == 'utf-8' else encoding
+            try:
+                with open(self.csv_path, encoding=encoding, newline='') as f:
+                    reader = csv.reader(f)
+                    header = next(reader, None)
+                    if header is None:
+                        raise ValueError(f"CSV file {self.csv_path} is empty")
+                    row_count = sum(1 for fields in reader if fields)
+                return encoding, self._column_names(header), row_count
+            except UnicodeDecodeError:
+                continue
+        raise Exception(f"Could not read CSV with any of the tried encodings: {CSV_ENCODINGS}")
+
+    @staticmethod
+    def _column_names(header: List[str]) -> List[str]:
+        columns = []
+        for position, name in enumerate(header):
+            name = name if name else f"Unnamed: {position}"
+            candidate, suffix = name, 0
+            while candidate in columns:
+                suffix += 1
+                candidate = f"{name}.{suffix}"
+            columns.append(candidate)
+        return columns
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def __iter__(self) -> Iterator[Dict[str, Optional[str]]]:
+        width = len(self.columns)
+        with open(self.csv_path, encoding=self.encoding, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            row_number = 0
+            for fields in reader:
+                if not fields:
+                    # pandas skips blank lines without counting them
+                    continue
+                row_number += 1
+                if len(fields) > width:
+                    raise ValueError(f"Row {row_number}: expected {width} fields, saw {len(fields)}")
+                fields += [''] * (width - len(fields))
+                yield {
+                    column: None if value in PANDAS_NA_VALUES else value
+                    for column, value in zip(self.columns, fields)
+                }
+
+
+class StreamingDataProcessor(DataProcessor):
+    """DataProcessor running on CsvSource instead of a DataFrame.
+
+    Mappings, cleaners, validation and output are the same as the pandas engine.
+    """
+
+    def read_csv(self, csv_path: str, chunked: bool = False) -> CsvSource:
+        """Open a CSV file for streaming; it is always read row by row"""
+        try:
+            source = CsvSource(csv_path)
+        except Exception as e:
+            logger.error(f"Failed to read CSV file {csv_path}: {e}")
+            raise
+        logger.info(f"Successfully opened CSV with {source.encoding} encoding")
+        logger.info(f"CSV shape: ({len(source)}, {len(source.columns)})")
+        logger.info(f"Columns: {source.columns}")
+        return source
+
+    def iter_rows(self, df: CsvSource) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (source row number, row) pairs; row numbers are 1-based data rows"""
+        return enumerate(df, 1)
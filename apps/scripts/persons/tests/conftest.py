@@ -0,0 +1,74 @@
+"""
+Shared fixtures for the import script tests
+The scripts import each other as top-level modules, so their directory goes on sys.path
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def person_schema():
+    """The person table as introspected after the centers migration (no `center` column)"""
+    columns = [
+        {'name': name, 'type': column_type, 'max_length': None, 'not_null': not_null,
+         'has_default': has_default, 'enum_values': enum_values}
+        for name, column_type, not_null, has_default, enum_values in [
+            ('id', 'uuid', True, True, None),
+            ('firstName', 'character varying(100)', True, False, None),
+            ('lastName', 'character varying(100)', True, False, None),
+            ('address', 'text', True, False, None),
+            ('emailId', 'text', False, False, None),
+            ('primaryPhone', 'text', False, False, None),
+            ('secondaryPhone', 'text', False, False, None),
+            ('type', 'person_type', False, False, ['interested', 'contact', 'sangha_member', 'attended_orientation']),
+            ('membershipType', 'membership_type', False, False,
+             ['Life Time', 'Board Member', 'General Member', 'Honorary Member']),
+            ('hasMembershipCard', 'boolean', False, False, None),
+            ('membershipCardNumber', 'text', False, False, None),
+            ('yearOfRefuge', 'integer', False, False, None),
+            ('yearOfRefugeCalendarType', 'calendar_type', False, False, ['BS', 'AD']),
+            ('refugeName', 'text', False, False, None),
+            ('occupation', 'text', False, False, None),
+            ('title', 'person_title', False, False,
+             ['dharma_dhar', 'sahayak_dharmacharya', 'sahayak_samathacharya', 'khenpo', 'dharmacharya']),
+            ('notes', 'text', False, False, None),
+            ('createdBy', 'text', True, False, None),
+            ('lastUpdatedBy', 'text', True, False, None),
+            ('createdAt', 'timestamp with time zone', True, True, None),
+            ('updatedAt', 'timestamp with time zone', True, True, None),
+            ('import_batch_id', 'uuid', False, False, None),
+            ('center_id', 'uuid', False, False, None),
+        ]
+    ]
+    return {'table': 'person', 'columns': columns, 'checks': []}
+
+
+@pytest.fixture
+def membership_csv(tmp_path):
+    """A membership export with every mapped column, a rejected row, a duplicate and blank cells"""
+    from config import ImportConfig
+
+    columns = list(ImportConfig.COLUMN_MAPPINGS)
+    people = [
+        {'First Name(export)': 'Ram', 'Last Name': 'Thapa', 'Address ': 'Kathmandu',
+         'Primary Phone number': '9841234501', 'Membership Card Number ': '1001',
+         'Membership Type': 'Life Time', 'Year of Refuge': '2065', 'Year of Refuge Calendar Type': 'BS',
+         'Remarks': 'Husband of Sita Devi Thapa. Lives in Pokhara'},
+        {'First Name(export)': 'Sita Devi', 'Last Name': 'Thapa', 'Address ': 'Kathmandu',
+         'Email Address': 'Sita@Example.com', 'Photo?': 'Yes', 'Education ': 'MA'},
+        {'First Name(export)': 'Hari', 'Last Name': 'Shah'},
+        {'First Name(export)': 'Ram', 'Last Name': 'Thapa', 'Address ': 'Lalitpur'},
+        {'First Name(export)': 'Gopal', 'Last Name': "O'Neil", 'Address ': 'Pokhara, Kaski',
+         'Dharma Instructor': 'Khenpo', 'Remarks': 'NA'},
+    ]
+    lines = [','.join(columns)]
+    for person in people * 5:
+        cells = [person.get(column, '') for column in columns]
+        lines.append(','.join(f'"{cell}"' if ',' in cell else cell for cell in cells))
+    path = tmp_path / 'members.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
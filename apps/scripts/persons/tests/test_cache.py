@@ -0,0 +1,127 @@
+"""
+Tests for the processing cache
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+from cache import ProcessingCache
+from data_processor import DataProcessor
+
+
+@pytest.fixture
+def same_named_files(tmp_path):
+    paths = []
+    for directory, name in (('a', 'Ram'), ('b', 'Sita')):
+        os.makedirs(tmp_path / directory)
+        path = tmp_path / directory / 'members.csv'
+        path.write_text(f"First Name(export),Last Name\n{name},Thapa\n")
+        paths.append(str(path))
+    return paths
+
+
+def rows_for(name):
+    record = {'firstName': name, 'lastName': 'Thapa', 'createdAt': datetime(2024, 1, 2, 3, 4, 5),
+              '_relationships': [['spouse', 'Hari Thapa']]}
+    return [(1, record, []), (2, None, ['Row 2: Missing required field']), (3, None, [])]
+
+
+def cache_key(cache, csv_path):
+    processor = DataProcessor()
+    return cache.key(csv_path, processor.config, processor, skip_duplicates=True, schema=None)
+
+
+def test_same_named_files_are_cached_separately(tmp_path, same_named_files):
+    cache = ProcessingCache(str(tmp_path / 'cache'))
+    for path, name in zip(same_named_files, ('Ram', 'Sita')):
+        cache.save(path, cache_key(cache, path), f"preview {name}", rows_for(name))
+
+    for path, name in zip(same_named_files, ('Ram', 'Sita')):
+        entry = cache.load(path, cache_key(cache, path))
+        assert entry is not None
+        assert entry['preview'] == f"preview {name}"
+        first_row = next(cache.iter_rows(entry, DataProcessor()))
+        assert first_row[1]['firstName'] == name
+
+
+def test_rows_round_trip_with_fresh_ids(tmp_path, same_named_files):
+    cache = ProcessingCache(str(tmp_path / 'cache'))
+    path = same_named_files[0]
+    cache.save(path, 'k' * 64, 'preview', rows_for('Ram'))
+
+    rows = list(cache.iter_rows(cache.load(path, 'k' * 64), DataProcessor()))
+    assert [(row_number, errors) for row_number, _, errors in rows] == [
+        (1, []), (2, ['Row 2: Missing required field']), (3, [])
+    ]
+    record = rows[0][1]
+    assert record['_relationships'] == [['spouse', 'Hari Thapa']]
+    assert isinstance(record['createdAt'], datetime) and record['createdAt'].year != 2024
+    assert record['id']
+
+
+def test_newer_entry_replaces_older_one(tmp_path, same_named_files):
+    cache = ProcessingCache(str(tmp_path / 'cache'))
+    path = same_named_files[0]
+    cache.save(path, 'a' * 64, 'old', rows_for('Ram'))
+    cache.save(path, 'b' * 64, 'new', rows_for('Ram'))
+
+    assert cache.load(path, 'a' * 64) is None
+    assert cache.load(path, 'b' * 64)['preview'] == 'new'
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+
+
+def test_pruning_tolerates_entries_removed_by_another_worker(tmp_path, same_named_files, monkeypatch):
+    cache = ProcessingCache(str(tmp_path / 'cache'))
+    path = same_named_files[0]
+    cache.save(path, 'a' * 64, 'old', rows_for('Ram'))
+    stale = os.path.join(cache.cache_dir, os.listdir(cache.cache_dir)[0])
+    listdir = os.listdir
+
+    def racing_listdir(directory):
+        # Another worker removes the stale entry between our listdir and remove
+        entries = listdir(directory)
+        os.remove(stale)
+        return entries
+
+    monkeypatch.setattr(os, 'listdir', racing_listdir)
+
+    cache.save(path, 'b' * 64, 'new', rows_for('Ram'))
+    assert cache.load(path, 'b' * 64) is not None
+
+
+def test_recording_writes_only_complete_entries(tmp_path, same_named_files):
+    cache = ProcessingCache(str(tmp_path / 'cache'))
+    path = same_named_files[0]
+
+    stream = cache.recording(path, 'a' * 64, 'preview', rows_for('Ram'))
+    next(stream)
+    stream.close()
+    assert cache.load(path, 'a' * 64) is None
+    assert os.listdir(cache.cache_dir) == []
+
+    assert list(cache.recording(path, 'a' * 64, 'preview', rows_for('Ram'))) == rows_for('Ram')
+    assert cache.load(path, 'a' * 64) is not None
+
+
+def test_cache_directory_is_private(tmp_path, same_named_files):
+    cache = ProcessingCache(str(tmp_path / 'cache'))
+    cache.save(same_named_files[0], 'a' * 64, 'preview', rows_for('Ram'))
+    assert os.stat(cache.cache_dir).st_mode & 0o077 == 0
+
+
+def test_schema_code_changes_invalidate_the_cache(tmp_path, monkeypatch):
+    import importlib.util
+    import types
+
+    processor = DataProcessor()
+    schema_source = tmp_path / 'schema.py'
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: types.SimpleNamespace(origin=str(schema_source))
+                        if name == 'schema' else find_spec(name))
+
+    schema_source.write_text("CHECK = 'old'\n")
+    before = ProcessingCache.config_fingerprint(processor.config, processor)
+    schema_source.write_text("CHECK = 'new'\n")
+
+    assert ProcessingCache.config_fingerprint(processor.config, processor) != before
@@ -0,0 +1,155 @@
+"""
+Tests for database loading, rehearsal and batch rollback, run against a recording fake connection
+"""
+import contextlib
+
+import pytest
+
+from batching import AdaptiveBatchSizer
+from database import DatabaseManager
+
+
+class RecordingCursor:
+    def __init__(self, statements):
+        self.statements = statements
+        self.connection = None
+        self.last = ''
+
+    def execute(self, sql, params=None):
+        self.statements.append(' '.join(sql.split()))
+        self.last = sql
+
+    def fetchone(self):
+        if 'pg_wal_lsn_diff' in self.last:
+            return (8192,)
+        return ('0/0',)
+
+    def fetchall(self):
+        if 'pg_get_indexdef' in self.last:
+            return [('person_rehearsal_bulk_lastName_idx',
+                     'CREATE INDEX "person_rehearsal_bulk_lastName_idx" ON public.person_rehearsal_bulk ("lastName")')]
+        return []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class RecordingConnection:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def cursor(self):
+        cursor = RecordingCursor(self.statements)
+        cursor.connection = self
+        return cursor
+
+    def commit(self):
+        self.statements.append('COMMIT')
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+
+
+class RecordingDatabase(DatabaseManager):
+    def __init__(self):
+        super().__init__({})
+        self.statements = []
+        self.insert_tables = []
+
+    @contextlib.contextmanager
+    def get_connection(self):
+        yield RecordingConnection(self.statements)
+
+    def _insert_batch(self, cursor, batch, results, table='person'):
+        self.insert_tables.append(table)
+        results['success'] += len(batch)
+
+
+def test_bulk_rehearsal_never_changes_the_live_table():
+    db = RecordingDatabase()
+    results = db.rehearse_load([(1, {'firstName': 'Ram'}), (2, {'firstName': 'Sita'})], bulk_load=True)
+
+    assert results['errors'] == []
+    assert results['success'] == 2
+    assert db.insert_tables == ['person_rehearsal_bulk']
+    assert 'CREATE TABLE person_rehearsal_bulk (LIKE person INCLUDING ALL)' in db.statements
+    index_changes = [statement for statement in db.statements if statement.startswith(('DROP INDEX', 'CREATE INDEX', 'ANALYZE'))]
+    assert index_changes == [
+        'DROP INDEX public."person_rehearsal_bulk_lastName_idx"',
+        'CREATE INDEX "person_rehearsal_bulk_lastName_idx" ON public.person_rehearsal_bulk ("lastName")',
+        'ANALYZE person_rehearsal_bulk',
+    ]
+    assert db.statements[-1] == 'ROLLBACK'
+    assert db.statements.count('COMMIT') == 5  # only the commit latency samples, on their own connection
+
+
+def test_docker_rollback_runs_one_psql_transaction(monkeypatch):
+    db = RecordingDatabase()
+    scripts = []
+    monkeypatch.setattr(db, 'query_via_docker', lambda script: scripts.append(script) or "SET\nDO\n12|4")
+
+    removed = db.rollback_import('3F1C2B9E-7D4A-4B8E-9A61-0C2D5E8F1A77', use_docker=True)
+
+    assert removed == {'persons': 12, 'relationships': 4}
+    assert db.statements == []
+    assert len(scripts) == 1
+    assert "import_batch_id = '3f1c2b9e-7d4a-4b8e-9a61-0c2d5e8f1a77'" in scripts[0]
+    assert 'RAISE EXCEPTION' in scripts[0]
+
+
+def test_rollback_rejects_ids_that_are_not_uuids():
+    db = RecordingDatabase()
+    with pytest.raises(ValueError):
+        db.rollback_import("x'; DROP TABLE person; --", use_docker=True)
+
+
+def test_adaptive_sizing_over_docker_warns(monkeypatch, caplog):
+    db = RecordingDatabase()
+    monkeypatch.setattr(db, 'insert_person', lambda person_data, use_docker=False: True)
+    results = db.load_persons([(1, {'firstName': 'Ram'})], use_docker=True, sizer=AdaptiveBatchSizer())
+
+    assert results['success'] == 1
+    assert 'Adaptive batch sizing has no effect with --use-docker' in caplog.text
+
+
+def failing_cleaner(good_rows):
+    """Processed rows that stop with an exception partway through the file"""
+    for row_number in range(1, good_rows + 1):
+        yield row_number, {'firstName': f'Person {row_number}'}, []
+    raise ValueError('unreadable chunk')
+
+
+@pytest.mark.parametrize('use_docker', [False, True])
+def test_cleaner_failure_marks_pipelined_load_aborted(monkeypatch, use_docker):
+    from pipeline import ImportPipeline
+
+    db = RecordingDatabase()
+    monkeypatch.setattr(db, 'insert_person', lambda person_data, use_docker=False: True)
+    results = ImportPipeline(db, batch_size=2, use_docker=use_docker).run(failing_cleaner(3))
+
+    # Only the full batch was queued before the cleaner failed
+    assert results['success'] == 2
+    assert results['failed'] == 0
+    assert results['aborted']
+    assert any('unreadable chunk' in error for error in results['errors'])
+
+
+def test_complete_load_is_not_aborted():
+    results = RecordingDatabase().load_persons([(1, {'firstName': 'Ram'}), (2, {'firstName': 'Sita'})])
+
+    assert results['success'] == 2
+    assert not results['aborted']
+
+
+def test_bulk_load_locks_the_table_before_dropping_indexes(caplog):
+    db = RecordingDatabase()
+    results = db.bulk_load_persons([(1, {'firstName': 'Ram'})])
+
+    assert results['success'] == 1
+    lock = db.statements.index('LOCK TABLE person IN ACCESS EXCLUSIVE MODE')
+    assert db.statements.index("SET LOCAL lock_timeout = '30s'") < lock
+    assert lock < min(i for i, statement in enumerate(db.statements) if statement.startswith('DROP INDEX'))
+    assert 'locked against all reads and writes' in caplog.text
@@ -0,0 +1,66 @@
+"""
+Tests that every way of reading a CSV produces the same processed rows
+"""
+import pytest
+
+from data_processor import ChunkedCsvFrame, DataProcessor
+
+# Assigned fresh on every run
+VOLATILE_FIELDS = ('id', 'createdAt', 'updatedAt')
+
+
+def processed(processor, df):
+    rows = []
+    for row_number, record, errors in processor.iter_processed_rows(df):
+        if record is not None:
+            record = {field: value for field, value in record.items() if field not in VOLATILE_FIELDS}
+        rows.append((row_number, record, errors))
+    return rows
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 4, 1000])
+def test_chunked_read_matches_whole_file(membership_csv, chunk_rows):
+    processor = DataProcessor()
+    whole = processor.read_csv(membership_csv)
+    chunked = ChunkedCsvFrame(membership_csv, processor.CSV_READ_OPTIONS, chunk_rows=chunk_rows)
+
+    assert len(chunked) == len(whole) == 25
+    assert chunked.columns == list(whole.columns)
+    assert processed(processor, chunked) == processed(processor, whole)
+    assert processor.generate_preview(chunked) == processor.generate_preview(whole)
+
+
+def test_read_csv_chunked_is_lazy(membership_csv):
+    df = DataProcessor().read_csv(membership_csv, chunked=True)
+    assert isinstance(df, ChunkedCsvFrame)
+    assert df.shape == (25, len(df.columns))
+
+
+@pytest.fixture
+def awkward_csv(tmp_path):
+    """BOM, a blank and a repeated header, NA spellings and blank lines between rows"""
+    path = tmp_path / 'awkward.csv'
+    path.write_bytes(
+        '﻿First Name(export),Last Name,Address ,,Last Name,Remarks\n'
+        'Ram,Thapa,NA,x,dup,null\n'
+        '\n'
+        'Sita,Shah,N/A,,,Wife of Ram Thapa\n'
+        'Hari,,Pokhara,,,\n'.encode('utf-8')
+    )
+    return str(path)
+
+
+@pytest.mark.parametrize('csv_fixture', ['membership_csv', 'awkward_csv'])
+def test_csv_engine_matches_pandas_engine(request, csv_fixture):
+    from streaming import StreamingDataProcessor
+
+    csv_path = request.getfixturevalue(csv_fixture)
+    pandas_processor = DataProcessor()
+    csv_processor = StreamingDataProcessor()
+    pandas_df = pandas_processor.read_csv(csv_path)
+    csv_df = csv_processor.read_csv(csv_path)
+
+    assert list(csv_df.columns) == list(pandas_df.columns)
+    assert len(csv_df) == len(pandas_df)
+    assert processed(csv_processor, csv_df) == processed(pandas_processor, pandas_df)
+    assert csv_processor.generate_preview(csv_df) == pandas_processor.generate_preview(pandas_df)
@@ -0,0 +1,43 @@
+"""
+Tests for the import command's option handling
+"""
+import argparse
+import logging
+
+import pytest
+
+from config import ImportConfig
+from import_persons import resolve_center
+
+logger = logging.getLogger(__name__)
+
+
+class CenterLookup:
+    def __init__(self, centers):
+        self.centers = centers
+        self.lookups = []
+
+    def find_center_id(self, name, use_docker=False):
+        self.lookups.append(name)
+        return self.centers.get(name)
+
+
+def test_default_center_leaves_center_id_empty_without_a_lookup():
+    db = CenterLookup({})
+    args = argparse.Namespace(center=ImportConfig.DEFAULT_CENTER, use_docker=False)
+
+    assert resolve_center(args, db, logger) is None
+    assert db.lookups == []
+
+
+def test_named_center_is_resolved_to_its_id():
+    db = CenterLookup({'Nepal': 'c0ffee00-0000-0000-0000-000000000000'})
+    args = argparse.Namespace(center='Nepal', use_docker=False)
+
+    assert resolve_center(args, db, logger) == 'c0ffee00-0000-0000-0000-000000000000'
+
+
+def test_unknown_center_says_how_to_proceed():
+    args = argparse.Namespace(center='Nepal', use_docker=False)
+    with pytest.raises(ValueError, match="--center ''"):
+        resolve_center(args, CenterLookup({}), logger)
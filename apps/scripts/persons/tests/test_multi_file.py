@@ -0,0 +1,71 @@
+"""
+Tests for merging several files and the per-file report
+"""
+import os
+
+from multi_file import display_names, expand_csv_paths, format_file_report, merge_files
+
+
+def person(first_name, last_name, email=None):
+    return {'firstName': first_name, 'lastName': last_name, 'emailId': email}
+
+
+def file_result(path, rows):
+    return {'path': path, 'rows': rows, 'preview': '', 'structure_errors': [], 'cached': False}
+
+
+def report_rows(report):
+    """Report lines split into cells, keyed by file name"""
+    return {line.split()[0]: line.split()[1:] for line in report.splitlines()[2:]}
+
+
+def test_display_names_keep_distinguishing_directory():
+    names = display_names([os.path.join('exports', 'a', 'members.csv'), os.path.join('exports', 'b', 'members.csv')])
+    assert names == [os.path.join('a', 'members.csv'), os.path.join('b', 'members.csv')]
+
+
+def test_display_names_in_one_directory_are_file_names():
+    assert display_names(['exports/nepal.csv', 'exports/usa.csv']) == ['nepal.csv', 'usa.csv']
+
+
+def test_expand_csv_paths_drops_repeats_of_the_same_file(tmp_path):
+    path = tmp_path / 'members.csv'
+    path.write_text('x\n')
+    assert expand_csv_paths([str(path), os.path.join(str(tmp_path), '.', 'members.csv'), str(tmp_path / '*.csv')]) == [str(path)]
+
+
+def test_same_named_files_get_distinct_labels():
+    results = [
+        file_result('a/members.csv', [(1, person('Ram', 'Thapa'), []), (2, None, ['Row 2: Missing required field'])]),
+        file_result('b/members.csv', [(1, person('Sita', 'Shah'), []), (2, person('Ram', 'Thapa'), [])]),
+    ]
+    merged = merge_files(results)
+
+    labels = [label for label, _, _ in merged]
+    assert labels == ['a/members.csv:1', 'a/members.csv:2', 'b/members.csv:1', 'b/members.csv:2']
+    assert merged[1][2] == ['Row a/members.csv:2: Missing required field']
+    assert merged[3][1] is None
+    assert results[1]['counts']['duplicates_across_files'] == 1
+
+
+def test_failed_rows_are_charged_to_their_own_file():
+    results = [
+        file_result('a/members.csv', [(1, person('Ram', 'Thapa'), []), (2, person('Hari', 'Shah'), [])]),
+        file_result('b/members.csv', [(1, person('Sita', 'Shah'), []), (2, person('Gita', 'Rai'), [])]),
+    ]
+    merge_files(results)
+    load_results = {'success': 3, 'failed': 1, 'failed_rows': ['a/members.csv:2']}
+
+    rows = report_rows(format_file_report(results, load_results))
+    # Rows, Cleaned, Rejected, Dup (file), Dup (other files), Loaded, Failed
+    assert rows['a/members.csv'] == ['2', '2', '0', '0', '0', '1', '1']
+    assert rows['b/members.csv'] == ['2', '2', '0', '0', '0', '2', '0']
+    assert rows['TOTAL'] == ['4', '4', '0', '0', '0', '3', '1']
+
+
+def test_rolled_back_load_fails_every_cleaned_row():
+    results = [file_result('nepal.csv', [(1, person('Ram', 'Thapa'), [])]),
+               file_result('usa.csv', [(1, person('Sita', 'Shah'), [])])]
+    merge_files(results)
+    rows = report_rows(format_file_report(results, {'success': 0, 'failed': 2, 'failed_rows': []}))
+    assert rows['TOTAL'][-2:] == ['0', '2']
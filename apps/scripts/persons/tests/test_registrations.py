@@ -0,0 +1,23 @@
+"""
+Tests for cleaning registration form rows
+"""
+import math
+
+import pandas as pd
+
+from registrations import RegistrationProcessor
+
+
+def test_form_row_keeps_raw_data_with_empty_cells_as_none():
+    row = pd.Series({
+        'First Name and Middle Name': 'Sita Devi', 'Last Name / Surname': 'Thapa',
+        'Email Address': 'Sita@Example.com', 'Your Address': 'Kathmandu', 'Viber': math.nan
+    })
+    record = RegistrationProcessor().clean_row_data(row)
+
+    assert (record['first_name'], record['middle_name'], record['last_name']) == ('Sita', 'Devi', 'Thapa')
+    assert 'viber_number' not in record
+    assert record['raw_data'] == {
+        'First Name and Middle Name': 'Sita Devi', 'Last Name / Surname': 'Thapa',
+        'Email Address': 'Sita@Example.com', 'Your Address': 'Kathmandu', 'Viber': None
+    }
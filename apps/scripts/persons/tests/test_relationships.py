@@ -0,0 +1,46 @@
+"""
+Tests for relationship extraction and resolution
+"""
+import pytest
+
+from data_processor import DataProcessor
+from relationships import PersonIndex, RelationshipResolver
+
+
+def extract(remarks):
+    return DataProcessor().extract_relationships({'Remarks': remarks})
+
+
+@pytest.mark.parametrize('remarks, expected', [
+    ('Spouse: Ram Thapa', [('spouse', 'Ram Thapa')]),
+    ('son of Hari Shah', [('parent', 'Hari Shah')]),
+    ('Wife of Sita Devi Thapa. Lives in Pokhara', [('spouse', 'Sita Devi Thapa')]),
+    ('Daughter of Hari Shah, Member since 2010', [('parent', 'Hari Shah')]),
+    ('Son of Hari B. Shah. Joined in 2015', [('parent', 'Hari B. Shah')]),
+    ("Brother of Gopal O'Neil-Rai", [('sibling', "Gopal O'Neil-Rai")]),
+    ('Husband of sita@example.com.', [('spouse', 'sita@example.com')]),
+    ('Mother of +977 984-1234501', [('child', '+977 984-1234501')]),
+    ('Lives in Pokhara', []),
+])
+def test_extraction_examples(remarks, expected):
+    assert extract(remarks) == expected
+
+
+def test_references_resolve_in_both_directions():
+    index = PersonIndex.from_rows([
+        ('p1', 'Ram', None, 'Thapa', None, None),
+        ('p2', 'Sita', 'Devi', 'Thapa', 'sita@example.com', '9841234501'),
+    ])
+    references = [(1, 'p1', relationship_type, reference)
+                  for relationship_type, reference in extract('Husband of Sita Devi Thapa. Lives in Pokhara')]
+
+    relationships, rejects = RelationshipResolver(index).resolve(references)
+    assert rejects == []
+    assert sorted(relationships) == [('p1', 'p2', 'spouse'), ('p2', 'p1', 'spouse')]
+
+
+def test_unknown_reference_is_rejected_with_row_number():
+    index = PersonIndex.from_rows([('p1', 'Ram', None, 'Thapa', None, None)])
+    relationships, rejects = RelationshipResolver(index).resolve([(4, 'p1', 'parent', 'Hari Shah')])
+    assert relationships == []
+    assert rejects == ["Row 4: No person found for parent 'Hari Shah'"]
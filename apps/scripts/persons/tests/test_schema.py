@@ -0,0 +1,73 @@
+"""
+Tests for schema-driven validation
+"""
+from data_processor import DataProcessor
+from schema import SchemaRules
+
+
+def compile_check(definition):
+    return SchemaRules._compile_check(definition)
+
+
+def test_comparison_check():
+    column, predicate = compile_check('CHECK (("yearOfRefuge" > 1900))')
+    assert column == 'yearOfRefuge'
+    assert predicate(1990)
+    assert not predicate(1800)
+
+
+def test_any_check():
+    column, predicate = compile_check(
+        "CHECK (((\"yearOfRefugeCalendarType\")::text = ANY ((ARRAY['BS'::character varying, "
+        "'AD'::character varying])::text[])))"
+    )
+    assert column == 'yearOfRefugeCalendarType'
+    assert predicate('BS')
+    assert not predicate('XX')
+
+
+def test_null_or_check_on_same_column():
+    column, predicate = compile_check('CHECK ((("yearOfRefuge" IS NULL) OR ("yearOfRefuge" > 1900)))')
+    assert column == 'yearOfRefuge'
+    assert not predicate(1800)
+
+
+def test_null_or_check_on_other_column_is_left_to_database():
+    assert compile_check('CHECK ((("yearOfRefugeCalendarType" IS NULL) OR ("yearOfRefuge" > 1900)))') is None
+
+
+def test_unknown_columns(person_schema):
+    rules = SchemaRules(person_schema)
+    assert rules.unknown_columns(['firstName', 'center', 'center_id']) == ['center']
+
+
+def test_default_config_fits_person_table(person_schema):
+    processor = DataProcessor(schema_rules=SchemaRules(person_schema))
+    assert processor.check_target_fields() == []
+
+
+def test_misconfigured_field_fails_structure_check(person_schema):
+    processor = DataProcessor(schema_rules=SchemaRules(person_schema))
+    processor.config.DEFAULT_VALUES = {**processor.config.DEFAULT_VALUES, 'center': 'Nepal'}
+    assert processor.check_target_fields() == ["Configured fields not in table person: ['center']"]
+
+
+def test_row_validates_against_person_table(person_schema):
+    processor = DataProcessor(schema_rules=SchemaRules(person_schema), center_id='c0ffee00-0000-0000-0000-000000000000')
+    record = processor.clean_row_data({
+        'First Name(export)': 'Sita', 'Last Name': 'Thapa', 'Address ': 'Kathmandu',
+        'Primary Phone number': '9841234501', 'Remarks': None
+    })
+    assert record['center_id'] == 'c0ffee00-0000-0000-0000-000000000000'
+    assert processor.validate_row_data(record, 1) == (True, [])
+
+
+def test_stamped_columns_missing_from_table_fail_structure_check(person_schema):
+    person_schema['columns'] = [column for column in person_schema['columns']
+                                if column['name'] not in ('import_batch_id', 'center_id')]
+    processor = DataProcessor(schema_rules=SchemaRules(person_schema),
+                              import_batch_id='3f1c2b9e-7d4a-4b8e-9a61-0c2d5e8f1a77',
+                              center_id='c0ffee00-0000-0000-0000-000000000000')
+    assert processor.check_target_fields() == [
+        "Configured fields not in table person: ['import_batch_id', 'center_id']"
+    ]
@@ -0,0 +1,7 @@
+-- migrate:up
+ALTER TABLE person ADD COLUMN import_batch_id uuid;
+CREATE INDEX IF NOT EXISTS idx_person_import_batch ON person(import_batch_id) WHERE import_batch_id IS NOT NULL;
+
+-- migrate:down
+DROP INDEX IF EXISTS idx_person_import_batch;
+ALTER TABLE person DROP COLUMN IF EXISTS import_batch_id;
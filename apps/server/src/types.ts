@@ -239,6 +239,7 @@ export interface Person {
    */
   hasMembershipCard: boolean | null;
   id: Generated<string>;
+  import_batch_id: string | null;
   is_krama_instructor: Generated<boolean | null>;
   krama_instructor_person_id: string | null;
   /**